@@ -0,0 +1,354 @@
+""" A script that contains the columnar on-disk format of the stats of run
+experiments: a directory with one .npy file per array (column) and a
+metadata.json file with the remaining (scalar) stats. Columns are opened as
+memory maps only when they are first read, so a single stat of a large run
+can be loaded without reading the others. Columns can also be streamed to
+raw binary files while a run is in progress, with ColumnWriter.
+Pickle files of stats from before this format are read by the same loader.
+"""
+
+
+""" IMPORTS """
+
+import numpy as np
+import pickle
+import json
+import os
+import queue
+import threading
+from collections.abc import Mapping
+
+
+""" FUNCTIONS """
+
+METADATA = "metadata.json"
+FORMAT = "sandpile-columns"
+VERSION = 1
+
+def column_fname(name):
+    """ Returns the file name of the .npy file of a column.
+
+    Parameters
+    ==========
+
+    name: str
+
+        Name of the column, such as "Lost mass".
+
+    """
+
+    return name.lower().replace(" ", "_") + ".npy"
+
+def to_json(value):
+    """ Converts a numpy scalar or tuple of numpy scalars to a value that can
+    be saved to JSON.
+    """
+
+    if isinstance(value, (tuple, list)):
+        return [to_json(x) for x in value]
+
+    return value.item() if hasattr(value, "item") else value
+
+def is_column(value):
+    """ Returns whether a stat is saved as a column (an array or list) rather
+    than as metadata (a scalar or tuple).
+    """
+
+    return not isinstance(value, tuple) and np.ndim(value) > 0
+
+class ColumnWriter:
+
+    """ A column of numbers that is written to a raw binary file in blocks of
+    a fixed size as it is appended to, as a GrowableArray is appended to.
+    Full blocks are written to the file by a background thread, so appending
+    does not wait for the disk, and at most `queue_size` blocks wait to be
+    written at any time, so the memory used by a column does not grow with
+    its length.
+    """
+
+    def __init__(self, fname, dtype=int, block_size=65536, queue_size=4):
+        """Initialize an empty column written to `fname`, which is
+        overwritten.
+        """
+        self.fname = fname
+        self.dtype = np.dtype(dtype)
+        self.file = open(fname, "wb")
+
+        self.block = np.empty(block_size, dtype=dtype)
+        self.fill = 0
+        self.size = 0
+
+        # Blocks waiting to be written by the background thread, and the
+        # error of the thread, if any, which is raised by the next append.
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self.write_blocks, daemon=True)
+        self.thread.start()
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"ColumnWriter({self.fname!r}, size={self.size})"
+
+    def write_blocks(self):
+        """Write the blocks in the queue to the file until the column is
+        closed. This runs in the background thread.
+        """
+
+        while True:
+            block = self.queue.get()
+            if block is None:
+                break
+
+            if self.error is None:
+                try:
+                    block.tofile(self.file)
+                except Exception as error:
+                    self.error = error
+
+    def check_error(self):
+        """Raise the error of the background thread, if any."""
+
+        if self.error is not None:
+            raise self.error
+
+    def flush_block(self):
+        """Queue the current (full or partial) block to be written."""
+
+        self.check_error()
+        self.queue.put(self.block[:self.fill].copy())
+        self.fill = 0
+
+    def append(self, value):
+        """Append a number to the column."""
+
+        self.block[self.fill] = value
+        self.fill += 1
+        self.size += 1
+
+        if self.fill == len(self.block):
+            self.flush_block()
+
+    def extend(self, values):
+        """Append an array of numbers to the column."""
+
+        values = np.asarray(values)
+        self.size += len(values)
+
+        while len(values):
+            count = min(len(values), len(self.block) - self.fill)
+            self.block[self.fill:self.fill + count] = values[:count]
+            self.fill += count
+            values = values[count:]
+
+            if self.fill == len(self.block):
+                self.flush_block()
+
+    def close(self):
+        """Write the rest of the column to the file and close it."""
+
+        if self.file.closed:
+            return
+
+        if self.fill:
+            self.flush_block()
+
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+        self.check_error()
+
+def save_columns(directory, stats):
+    """ Saves a dictionary of stats to a directory in the columnar format.
+    Every array (or list) is saved as a column and every other value is saved
+    to the metadata. Tuples, such as "Dimensions", are saved to the metadata.
+    Columns streamed to the directory with a ColumnWriter are closed and kept
+    in their raw binary files.
+
+    Parameters
+    ==========
+
+    directory: string
+
+        Name of output directory.
+
+    stats: dict
+
+        The stats, such as from SandPile.view_avalanche_stats.
+
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    columns = {}
+    attributes = {}
+    for name, value in stats.items():
+        if isinstance(value, ColumnWriter):
+            value.close()
+            columns[name] = {
+                "file": os.path.relpath(value.fname, directory),
+                "dtype": value.dtype.str,
+                "length": len(value)
+                }
+        elif is_column(value):
+            columns[name] = column_fname(name)
+            np.save(os.path.join(directory, columns[name]), np.asarray(value))
+        else:
+            attributes[name] = to_json(value)
+
+    metadata = {
+        "format": FORMAT,
+        "version": VERSION,
+        "columns": columns,
+        "attributes": attributes
+        }
+
+    # The metadata is written last, so a directory with metadata holds all of
+    # its columns.
+    with open(os.path.join(directory, METADATA), "w") as f:
+        json.dump(metadata, f, indent=4)
+
+class ColumnStore(Mapping):
+
+    """ A read-only dictionary of the stats saved to a directory in the
+    columnar format. Each column is loaded as a memory map the first time it
+    is read and then kept, and metadata is returned as saved.
+    Columns are saved either as .npy files or, if they were streamed, as raw
+    binary files whose dtype and length are kept in the metadata.
+    """
+
+    def __init__(self, directory, mmap_mode="r"):
+        """Open the stats saved to a directory. Columns are memory-mapped with
+        the given mode (see np.load), or read into memory if it is None.
+        """
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+
+        with open(os.path.join(directory, METADATA)) as f:
+            metadata = json.load(f)
+
+        if metadata.get("format") != FORMAT:
+            raise ValueError(f"{directory} is not a directory of columnar "
+                             "stats.")
+
+        self.columns = metadata["columns"]
+        self.attributes = metadata["attributes"]
+        self.loaded = {}
+
+    def __getitem__(self, name):
+        if name in self.attributes:
+            return self.attributes[name]
+
+        if name not in self.loaded:
+            column = self.columns[name]
+
+            if isinstance(column, dict):
+                fname = os.path.join(self.directory, column["file"])
+                dtype = np.dtype(column["dtype"])
+                length = column["length"]
+
+                if self.mmap_mode is None or length == 0:
+                    values = np.fromfile(fname, dtype=dtype, count=length)
+                else:
+                    values = np.memmap(fname, dtype=dtype,
+                                       mode=self.mmap_mode, shape=(length,))
+            else:
+                fname = os.path.join(self.directory, column)
+                values = np.load(fname, mmap_mode=self.mmap_mode)
+
+            self.loaded[name] = values
+
+        return self.loaded[name]
+
+    def __iter__(self):
+        return iter(list(self.columns) + list(self.attributes))
+
+    def __len__(self):
+        return len(self.columns) + len(self.attributes)
+
+    def __repr__(self):
+        return f"ColumnStore({self.directory!r})"
+
+class ConcatenatedColumn:
+
+    """ A read-only column that concatenates the columns of the same name of
+    several stats without loading them. Slices are read only from the columns
+    they overlap, and the columns are only concatenated in full when it is
+    converted to an array.
+    """
+
+    def __init__(self, stats, name):
+        """Concatenate the column `name` of each of a list of stats."""
+        self.stats = stats
+        self.name = name
+
+        self.lengths = np.array([len(part[name]) for part in stats])
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __repr__(self):
+        return f"ConcatenatedColumn({self.name!r}, parts={len(self.stats)})"
+
+    def __array__(self, dtype=None, copy=None):
+        array = np.concatenate([np.asarray(part[self.name])
+                                for part in self.stats])
+
+        return array if dtype is None else array.astype(dtype)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return np.asarray(self)[index]
+
+            parts = []
+            for part, offset, length in zip(self.stats, self.offsets,
+                                            self.lengths):
+                low = max(start - offset, 0)
+                high = min(stop - offset, length)
+                if low < high:
+                    parts.append(np.asarray(part[self.name][low:high]))
+
+            if not parts:
+                return np.asarray(self.stats[0][self.name][:0])
+
+            return np.concatenate(parts)
+
+        if np.ndim(index) == 0:
+            index = int(index)
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("column index out of range")
+
+            part = np.searchsorted(self.offsets, index, side="right") - 1
+            return self.stats[part][self.name][index - self.offsets[part]]
+
+        return np.asarray(self)[index]
+
+def load_stats(fname, mmap_mode="r"):
+    """ Returns the stats saved to a directory in the columnar format as a
+    ColumnStore, or the dictionary of stats saved to a pickle file.
+
+    Parameters
+    ==========
+
+    fname: string
+
+        Name of the stats directory or pickle file.
+
+    mmap_mode: str, optional
+
+        Memory-map mode of the columns (see np.load). Defaults to "r".
+
+    """
+
+    if os.path.isdir(fname):
+        return ColumnStore(fname, mmap_mode)
+
+    with open(fname, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,449 @@
+""" A script that contains an ensemble of independent replicas of a sandpile
+model, which are stored as one 3-D grid and run in lockstep with array
+operations instead of one sandpile at a time.
+"""
+
+
+""" IMPORTS """
+
+import inspect
+import numpy as np
+import pickle
+
+import columnar
+import histogram
+import sandpile
+
+
+""" FUNCTIONS """
+
+class SandPileEnsemble:
+
+    """ AN ENSEMBLE OF SANDPILES:
+    This program establishes the set of functions to run many independent
+    realisations (replicas) of a sandpile model at once. The grids of all
+    replicas are stored as a single (replicas, length, width) array, and at
+    every step each replica either drops a grain of sand or topples one sweep
+    of its current avalanche, all with vectorized operations.
+
+    Details:
+    - The model is any sandpile class with an Abelian toppling rule
+    (SandPile or SandPileEXT1), and each replica behaves like an instance of
+    that class whose avalanches are run with increment_time=False.
+    - Avalanche stats are recorded for each replica in the same format as
+    SandPile.save_avalanche_stats, so that each replica (or the merged data
+    of all replicas) can be loaded by the Observables class.
+
+    """
+
+    def __init__(self, num_replicas, length, width,
+                 sandpile_class=sandpile.SandPile, threshold=None, seed=None):
+        """Initialize an ensemble of `num_replicas` sandpiles of the given
+        class, with the specified length and width. If `threshold` is None,
+        the default threshold of the class is used. The ensemble draws its
+        drops from its own random number generator, seeded with `seed`.
+        """
+        self.rule = sandpile_class.rule
+        if not self.rule.abelian:
+            raise ValueError(f"{sandpile_class.__name__} does not have an "
+                             "Abelian toppling rule, so its replicas cannot "
+                             "be toppled in lockstep.")
+
+        if threshold is None:
+            signature = inspect.signature(sandpile_class.__init__)
+            threshold = signature.parameters["threshold"].default
+
+        self.num_replicas = num_replicas
+        self.length = length
+        self.width = width
+        self.threshold = threshold
+        self.rng = np.random.default_rng(seed)
+
+        self.grid = np.zeros((num_replicas, length, width), dtype=int)
+
+        # Number of grains each cell loses when it topples: one per neighbour,
+        # or one per neighbour inside the grid for a closed boundary.
+        self.grains = len(self.rule.offsets)
+        if self.rule.boundary == "closed":
+            self.grains = np.zeros((length, width), dtype=int)
+            for di, dj in self.rule.offsets:
+                self.grains[max(-di, 0):length - max(di, 0),
+                            max(-dj, 0):width - max(dj, 0)] += 1
+
+        self.mass = np.zeros(num_replicas, dtype=int)
+        self.time = np.zeros(num_replicas, dtype=int)
+
+        # Mask of the cells toppled so far in the current avalanche of each
+        # replica.
+        self.visited = np.zeros(self.grid.shape, dtype=bool)
+
+        # State of the current avalanche of each replica.
+        self.in_avalanche = np.zeros(num_replicas, dtype=bool)
+        self.start_mass = np.zeros(num_replicas, dtype=int)
+        self.start_time = np.zeros(num_replicas, dtype=int)
+        self.aval_topples = np.zeros(num_replicas, dtype=int)
+        self.first_toppled_cell = np.zeros((num_replicas, 2), dtype=int)
+
+        # Track the mass of every replica at each of its time steps, tagged
+        # with the replica it belongs to.
+        self.mass_replica = sandpile.GrowableArray()
+        self.mass_history = sandpile.GrowableArray()
+
+        # Record the observables of each avalanche, tagged with the replica
+        # it belongs to.
+        self.aval_replica = sandpile.GrowableArray()
+        self.aval_duration = sandpile.GrowableArray()
+        self.topples = sandpile.GrowableArray()
+        self.area = sandpile.GrowableArray()
+        self.lost_mass = sandpile.GrowableArray()
+        self.distance = sandpile.GrowableArray()
+
+        # Log-binned histograms of the avalanche stats of all replicas, by
+        # name, which are updated by every avalanche once tracked.
+        self.histograms = {}
+
+    def num_of_avalanches(self):
+        """Return the number of avalanches recorded by each replica."""
+
+        return np.bincount(self.aval_replica.view(),
+                           minlength=self.num_replicas)
+
+    def record_mass(self, replicas):
+        """Increment the time of the given replicas by 1 and record their mass.
+
+        Parameters
+        ==========
+
+        replicas: array
+
+            Indices of the replicas.
+
+        """
+
+        self.time[replicas] += 1
+        self.mass_replica.extend(replicas)
+        self.mass_history.extend(self.mass[replicas])
+
+    def drop_sand(self, replicas, n=1, cell=None):
+        """Add `n` grains of sand to a random cell of each of the given
+        replicas and return the replicas that became unstable.
+
+        Parameters
+        ==========
+
+        replicas: array
+
+            Indices of the replicas.
+
+        n: int or iter
+
+            The number of grains of sand to drop, as in SandPile.drop_sand.
+            Defaults to 1.
+
+        cell: list
+
+            The cells on which grains of sand may be dropped, as in
+            SandPile.drop_sand. Defaults to None.
+
+        """
+
+        size = len(replicas)
+
+        if cell:
+            i, j = np.array(cell)[self.rng.integers(len(cell), size=size)].T
+        else:
+            i = self.rng.integers(self.length, size=size)
+            j = self.rng.integers(self.width, size=size)
+
+        if type(n) != int:
+            grains = self.rng.choice(n, size=size)
+        else:
+            grains = np.full(size, n)
+
+        self.grid[replicas, i, j] += grains
+        self.mass[replicas] += grains
+        self.record_mass(replicas)
+
+        return replicas[self.grid[replicas, i, j] >= self.threshold]
+
+    def start_avalanches(self, replicas):
+        """Start recording an avalanche on each of the given replicas.
+
+        Parameters
+        ==========
+
+        replicas: array
+
+            Indices of the replicas.
+
+        """
+
+        self.in_avalanche[replicas] = True
+        self.start_mass[replicas] = self.mass[replicas]
+        self.start_time[replicas] = self.time[replicas]
+        self.aval_topples[replicas] = 0
+
+    def topple_sweep(self, replicas, multi_topple=False):
+        """Topple every unstable cell of each of the given replicas once (or
+        as many times in a row as it can if `multi_topple` is True) and
+        return the replicas whose avalanche has ended because they were
+        already stable.
+
+        Parameters
+        ==========
+
+        replicas: array
+
+            Indices of the replicas.
+
+        multi_topple: bool
+
+            Whether to topple each cell as many times in a row as it can, as
+            in SandPile.avalanche. Defaults to False.
+
+        """
+
+        grid = self.grid[replicas]
+        unstable = grid >= self.threshold
+
+        toppling = unstable.any(axis=(1, 2))
+        ended = replicas[~toppling]
+
+        replicas = replicas[toppling]
+        grid = grid[toppling]
+        unstable = unstable[toppling]
+
+        if multi_topple:
+            times = np.where(unstable,
+                             (grid - self.threshold) // self.grains + 1, 0)
+        else:
+            times = unstable.astype(int)
+
+        # Record the first toppled cell of new avalanches for the distance.
+        new = self.aval_topples[replicas] == 0
+        if np.any(new):
+            first = np.argmax(unstable[new].reshape(np.sum(new), -1), axis=1)
+            self.first_toppled_cell[replicas[new]] = np.stack(
+                                    np.unravel_index(first, grid.shape[1:]),
+                                    axis=1)
+
+        sent = self.grains * times
+        received = self.received(times)
+
+        grid += received - sent
+        self.grid[replicas] = grid
+
+        self.mass[replicas] -= (sent - received).sum(axis=(1, 2))
+        self.aval_topples[replicas] += times.sum(axis=(1, 2))
+        self.visited[replicas] |= unstable
+        self.record_mass(replicas)
+
+        return ended
+
+    def received(self, times):
+        """Returns the number of grains each cell receives when every cell of
+        a stack of grids topples the given number of times.
+
+        Parameters
+        ==========
+
+        times: array
+
+            The number of topples of each cell, of shape (k, length, width).
+
+        """
+
+        received = np.zeros_like(times)
+        for di, dj in self.rule.offsets:
+            received[:, max(di, 0):self.length - max(-di, 0),
+                        max(dj, 0):self.width - max(-dj, 0)] += (
+                times[:, max(-di, 0):self.length - max(di, 0),
+                         max(-dj, 0):self.width - max(dj, 0)])
+
+        return received
+
+    def end_avalanches(self, replicas):
+        """Stop recording the current avalanche of each of the given replicas
+        and store its stats.
+
+        Parameters
+        ==========
+
+        replicas: array
+
+            Indices of the replicas.
+
+        """
+
+        visited = self.visited[replicas]
+        rows = np.arange(self.length)[None, :, None]
+        cols = np.arange(self.width)[None, None, :]
+        first_i, first_j = self.first_toppled_cell[replicas].T
+
+        distance = (abs(rows - first_i[:, None, None])
+                    + abs(cols - first_j[:, None, None]))
+        distance = np.where(visited, distance, 0).max(axis=(1, 2))
+
+        aval_stats = {
+            "Duration": self.time[replicas] - self.start_time[replicas],
+            "Topples": self.aval_topples[replicas],
+            "Area": visited.sum(axis=(1, 2)),
+            "Lost mass": self.start_mass[replicas] - self.mass[replicas],
+            "Distance": distance
+            }
+
+        self.aval_replica.extend(replicas)
+        self.aval_duration.extend(aval_stats["Duration"])
+        self.topples.extend(aval_stats["Topples"])
+        self.area.extend(aval_stats["Area"])
+        self.lost_mass.extend(aval_stats["Lost mass"])
+        self.distance.extend(aval_stats["Distance"])
+
+        for name, hist in self.histograms.items():
+            hist.update(aval_stats[name])
+
+        self.visited[replicas] = False
+        self.in_avalanche[replicas] = False
+
+    def track_histograms(self, bins_per_decade=10):
+        """Keep log-binned histograms of the avalanche stats of all replicas
+        from now on, as in SandPile.track_histograms. The histograms are
+        saved with the merged avalanche stats.
+
+        Parameters
+        ==========
+
+        bins_per_decade: int, optional
+
+            Number of bins in each decade. Defaults to 10.
+
+        """
+
+        self.histograms = {
+            name: histogram.LogHistogram(bins_per_decade)
+            for name in ("Duration", "Topples", "Area", "Lost mass",
+                         "Distance")
+            }
+
+    def run_avalanches(self, num_avalanches, n=1, cell=None,
+                       multi_topple=False):
+        """Run `num_avalanches` avalanches on every replica. At each step,
+        each replica that is running an avalanche topples one sweep, and each
+        of the other replicas drops grains of sand until it becomes unstable.
+
+        Parameters
+        ==========
+
+        num_avalanches: int
+
+            The number of avalanches to run on each replica.
+
+        n: int or iter
+
+            The number of grains of sand of each drop, as in
+            SandPile.drop_sand. Defaults to 1.
+
+        cell: list
+
+            The cells on which grains of sand may be dropped, as in
+            SandPile.drop_sand. Defaults to None.
+
+        multi_topple: bool
+
+            Whether to topple each cell as many times in a row as it can, as
+            in SandPile.avalanche. Defaults to False.
+
+        """
+
+        remaining = np.full(self.num_replicas, num_avalanches)
+
+        while np.any(remaining) or np.any(self.in_avalanche):
+            toppling = np.flatnonzero(self.in_avalanche)
+            if len(toppling):
+                ended = self.topple_sweep(toppling, multi_topple)
+                self.end_avalanches(ended)
+
+            dropping = np.flatnonzero(~self.in_avalanche & (remaining > 0))
+            if len(dropping):
+                unstable = self.drop_sand(dropping, n, cell)
+                self.start_avalanches(unstable)
+                remaining[unstable] -= 1
+
+    def view_avalanche_stats(self, replica=None):
+        """View the stats of all avalanches of one replica, or of all replicas
+        merged in order of replica.
+
+        Parameters
+        ==========
+
+        replica: int, optional
+
+            Index of the replica. If None, the stats of all replicas are
+            merged. Defaults to None.
+
+        """
+
+        order = np.argsort(self.aval_replica.view(), kind="stable")
+        if replica is not None:
+            order = order[self.aval_replica[order] == replica]
+
+        aval_stats = {}
+        aval_stats["Duration"] = self.aval_duration[order]
+        aval_stats["Topples"] = self.topples[order]
+        aval_stats["Area"] = self.area[order]
+        aval_stats["Lost mass"] = self.lost_mass[order]
+        aval_stats["Distance"] = self.distance[order]
+
+        return aval_stats
+
+    def save_avalanche_stats(self, fname, replica=None):
+        """Creates a dictionary object with all avalanche stats of one replica,
+        or of all replicas merged, in the same format as
+        SandPile.save_avalanche_stats and saves it all in the same way: to a
+        directory in the columnar format, or as a pickle file if `fname` ends
+        with ".pik".
+        This can be used as creating a file for the Observables class.
+        The merged stats hold the mass histories of the replicas one after
+        the other, the average grid of the replicas and the tracked
+        histograms.
+
+        Parameters
+        ==========
+
+        fname: string
+
+            Name of output directory, or of output pickle file.
+
+        replica: int, optional
+
+            Index of the replica. If None, the stats of all replicas are
+            merged. Defaults to None.
+
+        """
+
+        order = np.argsort(self.mass_replica.view(), kind="stable")
+
+        aval_stats = self.view_avalanche_stats(replica)
+        aval_stats["Dimensions"] = (self.length, self.width)
+        aval_stats["Threshold"] = self.threshold
+
+        if replica is None:
+            aval_stats["Time Elapsed"] = np.sum(self.time)
+            aval_stats["Mass History"] = self.mass_history[order]
+            aval_stats["Grid"] = self.grid.mean(axis=0)
+
+            if self.histograms:
+                aval_stats["Histograms"] = {name: hist.to_dict() for name, hist
+                                            in self.histograms.items()}
+        else:
+            order = order[self.mass_replica[order] == replica]
+            aval_stats["Time Elapsed"] = self.time[replica]
+            aval_stats["Mass History"] = self.mass_history[order]
+            aval_stats["Grid"] = self.grid[replica]
+
+        if fname.endswith(".pik"):
+            pickle.dump(aval_stats, open(fname, "wb"))
+        else:
+            columnar.save_columns(fname, aval_stats)
+
+        return aval_stats
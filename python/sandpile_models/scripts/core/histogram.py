@@ -0,0 +1,229 @@
+""" A script that contains an online histogram of an observable on
+logarithmically spaced bins, which is updated avalanche by avalanche and can
+be merged with the histograms of other runs or replicas, so distributions of
+observables can be estimated without keeping the raw data.
+"""
+
+
+""" IMPORTS """
+
+import numpy as np
+
+
+""" FUNCTIONS """
+
+def log_edges(bins_per_decade, decades):
+    """ Returns the integer edges of logarithmically spaced bins from 1 to
+    10^decades, with `bins_per_decade` bins in each decade. Bins narrower than
+    one integer are merged, so each bin holds at least one integer. The edges
+    of more decades start with the edges of fewer decades.
+
+    Parameters
+    ==========
+
+    bins_per_decade: int
+
+        Number of bins in each decade.
+
+    decades: int
+
+        Number of decades.
+
+    """
+
+    exponents = np.arange(decades * bins_per_decade + 1) / bins_per_decade
+    edges = np.ceil(np.round(10**exponents, 6)).astype(np.int64)
+
+    return np.unique(edges)
+
+class LogHistogram:
+
+    """ AN ONLINE LOG-BINNED HISTOGRAM:
+    This program establishes the set of functions to count the values of an
+    integer observable on logarithmically spaced bins as they are recorded.
+
+    Details:
+    - Bins are fixed by the number of bins per decade, so two histograms with
+    the same number of bins per decade can be merged by adding their counts.
+    - Bins are added as larger values are recorded.
+    - Zeros, which have no logarithm, are counted separately.
+    - The number, sum and maximum of the values are kept exactly.
+
+    """
+
+    def __init__(self, bins_per_decade=10, decades=3):
+        """Initialize an empty histogram with `bins_per_decade` bins in each
+        decade, with bins for values up to 10^decades to begin with.
+        """
+        self.bins_per_decade = bins_per_decade
+        self.decades = decades
+        self.edges = log_edges(bins_per_decade, decades)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+        self.zeros = 0
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def __repr__(self):
+        return (f"LogHistogram(bins_per_decade={self.bins_per_decade}, "
+                f"total={self.total})")
+
+    def grow(self, value):
+        """Add bins, by doubling the number of decades, until `value` falls
+        inside the last bin.
+        """
+
+        while value >= self.edges[-1]:
+            self.decades *= 2
+            self.edges = log_edges(self.bins_per_decade, self.decades)
+
+        if len(self.counts) < len(self.edges) - 1:
+            counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+            counts[:len(self.counts)] = self.counts
+            self.counts = counts
+
+    def update(self, values):
+        """Record a value or an array of values.
+
+        Parameters
+        ==========
+
+        values: int or array
+
+            The non-negative integer values to record.
+
+        """
+
+        values = np.atleast_1d(np.asarray(values, dtype=np.int64))
+        if not len(values):
+            return
+
+        largest = int(values.max())
+        self.grow(largest)
+
+        positive = values[values > 0]
+        bins = np.searchsorted(self.edges, positive, side="right") - 1
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+        self.zeros += len(values) - len(positive)
+        self.total += len(values)
+        self.sum += int(np.sum(positive))
+        self.max = max(self.max, largest)
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same number of bins
+        per decade to this histogram.
+
+        Parameters
+        ==========
+
+        other: LogHistogram
+
+            The histogram to merge.
+
+        """
+
+        if other.bins_per_decade != self.bins_per_decade:
+            raise ValueError("Histograms with different numbers of bins per "
+                             "decade cannot be merged.")
+
+        self.grow(other.edges[-1] - 1)
+        self.counts[:len(other.counts)] += other.counts
+
+        self.zeros += other.zeros
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+        return self
+
+    def __add__(self, other):
+        # Allow sum() of a list of histograms, which starts from 0.
+        if other == 0:
+            return self.copy()
+
+        return self.copy().merge(other)
+
+    __radd__ = __add__
+
+    def copy(self):
+        """Return a copy of the histogram."""
+
+        return LogHistogram.from_dict(self.to_dict())
+
+    def bins(self):
+        """Returns the lower and upper (exclusive) integer edges of the bins
+        that hold any values.
+        """
+
+        nonzero = self.counts > 0
+
+        return self.edges[:-1][nonzero], self.edges[1:][nonzero]
+
+    def pdf(self):
+        """Returns the probability distribution of the positive values, as
+        the bin centres (geometric means of the smallest and largest integer
+        of each bin) and the probability of each integer in each bin.
+        Bins without any values are left out.
+        """
+
+        lower, upper = self.bins()
+        counts = self.counts[self.counts > 0]
+
+        centres = np.sqrt(lower * (upper - 1))
+        pdf = counts / ((upper - lower) * np.sum(counts))
+
+        return centres, pdf
+
+    def moment(self, k):
+        """Returns an estimate of the k-th moment, <s^k>, of the values from
+        the bin centres, counting zeros.
+
+        Parameters
+        ==========
+
+        k: float
+
+            Order of the moment.
+
+        """
+
+        lower, upper = self.bins()
+        counts = self.counts[self.counts > 0]
+        centres = np.sqrt(lower * (upper - 1))
+
+        return np.sum(counts * centres.astype(float)**k) / self.total
+
+    def mean(self):
+        """Return the mean of the values."""
+
+        return self.sum / self.total
+
+    def to_dict(self):
+        """Returns the histogram as a dictionary of Python numbers and lists,
+        which can be saved to JSON or pickled.
+        """
+
+        return {
+            "Bins Per Decade": self.bins_per_decade,
+            "Decades": self.decades,
+            "Counts": self.counts.tolist(),
+            "Zeros": self.zeros,
+            "Total": self.total,
+            "Sum": self.sum,
+            "Max": self.max
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Returns the histogram saved with `to_dict`."""
+
+        histogram = cls(data["Bins Per Decade"], data["Decades"])
+        histogram.counts = np.array(data["Counts"], dtype=np.int64)
+        histogram.zeros = data["Zeros"]
+        histogram.total = data["Total"]
+        histogram.sum = data["Sum"]
+        histogram.max = data["Max"]
+
+        return histogram
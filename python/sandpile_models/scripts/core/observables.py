@@ -5,38 +5,68 @@ visualisations of avalanche stats from run experiments of the sandpile model.
 """ IMPORTS """
 
 import numpy as np
-from scipy import spatial, stats
+from scipy import spatial, stats, special
 import matplotlib.pyplot as plt
 import seaborn as sns
-import pickle
 from collections import namedtuple
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import copy
+import glob
+import os
+
+import columnar
+import histogram
+import powerlaw_mle
 
 
 """ FUNCTIONS """
 
 class Observables:
 
-    def __init__(self, data):
+    # Observables that are loaded from the stats of the given name the first
+    # time they are read.
+    columns = {
+        'aval_duration': 'Duration',
+        'topples': 'Topples',
+        'area': 'Area',
+        'lost_mass': 'Lost mass',
+        'distance': 'Distance',
+        'mass_history': 'Mass History',
+        'grid': 'Grid'
+        }
+
+    def __init__(self, data, mmap_mode="r"):
         """This class loads avalanche observables and provides analytic
         functionals and visualisations.
+        The stats are loaded from a directory in the columnar format (see
+        columnar.py), whose columns are memory-mapped with `mmap_mode` and
+        only read when used, or from a pickle file.
+        `data` may also be a glob pattern or a list of files (or patterns),
+        for example of the replicas of one configuration, whose stats are
+        presented as one run after the other (see ConcatenatedStats).
         """
-        data = pickle.load(open(data, "rb"))
-        self.data = data
+        self.runs = expand_runs(data)
 
-        self.aval_duration = self.data["Duration"]
-        self.topples = self.data["Topples"]
-        self.area = self.data["Area"]
-        self.lost_mass = self.data["Lost mass"]
-        self.distance = self.data["Distance"]
+        if len(self.runs) == 1:
+            self.data = columnar.load_stats(self.runs[0], mmap_mode)
+        else:
+            self.data = ConcatenatedStats([columnar.load_stats(run, mmap_mode)
+                                           for run in self.runs])
 
         self.length = self.data["Dimensions"][0]
         self.width = self.data["Dimensions"][1]
         self.threshold = self.data["Threshold"]
-        self.grid = self.data["Grid"]
 
         self.time_elapsed = self.data["Time Elapsed"]
-        self.mass_history = self.data["Mass History"]
+
+        # Log-binned histograms of the avalanche stats, by name, saved with
+        # the stats if they were tracked.
+        self.histograms = {
+            name: histogram.LogHistogram.from_dict(hist)
+            for name, hist in self.data.get("Histograms", {}).items()
+            }
 
         # X-axis label for observables.
         self.xlabels = {
@@ -48,6 +78,105 @@ class Observables:
         'mass_history': 'Mass (grains)'
         }
 
+    def __getattr__(self, name):
+        if name not in Observables.columns:
+            raise AttributeError(f"'Observables' object has no attribute "
+                                 f"'{name}'")
+
+        if Observables.columns[name] not in self.data:
+            raise AttributeError(f"The stats have no raw data of '{name}'.")
+
+        value = np.asarray(self.data[Observables.columns[name]])
+        setattr(self, name, value)
+
+        return value
+
+    def run_lengths(self, observable):
+        """ Returns the number of values of any observable in each run.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        """
+
+        if len(self.runs) == 1:
+            return np.array([len(self.data[Observables.columns[observable]])])
+
+        return self.data[Observables.columns[observable]].lengths
+
+    def run_index(self, observable):
+        """ Returns the index (in `runs`) of the run that each value of any
+        observable comes from.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        """
+
+        lengths = self.run_lengths(observable)
+
+        return np.repeat(np.arange(len(lengths)), lengths)
+
+    def map_runs(self, reduction, observable, processes=None, **kwargs):
+        """ Applies a reduction (the name of a method, such as
+        "value_counts") to any observable of each run on its own, in a pool
+        of processes, and returns the results in the order of the runs.
+
+        Parameters
+        ==========
+
+        reduction: str
+
+            Name of the method.
+
+        observable: str
+
+            Observable to reduce.
+
+        processes: int, optional
+
+            Number of processes in the pool. If None, one per CPU.
+            Defaults to None.
+
+        Other keyword arguments are passed to the method.
+
+        """
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(reduce_run, self.runs, repeat(reduction),
+                                 repeat(observable), repeat(kwargs)))
+
+    def iter_chunks(self, observable, chunk_size=2**20):
+        """ Iterates over any observable in chunks of `chunk_size` values,
+        read from the (memory-mapped) stats one chunk at a time, so an
+        observable too large to load can be reduced chunk by chunk.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to iterate over.
+
+        chunk_size: int, optional
+
+            The number of values in each chunk. Defaults to 2**20.
+
+        """
+
+        data = self.data[Observables.columns[observable]]
+
+        for start in range(0, len(data), chunk_size):
+            yield np.asarray(data[start:start + chunk_size])
+
     def histogram(self, observable, density=False):
         """ Produces a histogram or probability distribution of any observable.
 
@@ -151,10 +280,53 @@ class Observables:
         sns.heatmap(self.grid, xticklabels=False, yticklabels=False,
         *args, **kwargs)
 
+    def log_histogram(self, observable, bins_per_decade=10, processes=None):
+        """ Returns the log-binned histogram (see histogram.LogHistogram) of
+        any observable: the one saved with the stats if it has the given
+        number of bins per decade, or else one counted from the raw data,
+        chunk by chunk, and run by run in parallel for several runs.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        bins_per_decade: int, optional
+
+            Number of bins in each decade. Defaults to 10.
+
+        processes: int, optional
+
+            Number of processes for several runs (see `map_runs`).
+            Defaults to None.
+
+        """
+
+        hist = self.histograms.get(Observables.columns[observable])
+        if hist is not None and hist.bins_per_decade == bins_per_decade:
+            return hist
+
+        if len(self.runs) > 1:
+            return sum(self.map_runs("log_histogram", observable, processes,
+                                     bins_per_decade=bins_per_decade))
+
+        hist = histogram.LogHistogram(bins_per_decade)
+        for chunk in self.iter_chunks(observable):
+            hist.update(chunk)
+
+        return hist
+
     def powerlaw_fit(self, observable, cut=False, plot=False,
-                    xscale="linear", yscale="linear"):
+                    xscale="linear", yscale="linear", log_bins=False):
         """ Fits a power law equation to a probability distribution function
         with slope = b and intercept = log10(c).
+        By default, the frequency of each value of the observable is fitted.
+        With log_bins, the probability of each value estimated from the
+        log-binned histogram of the observable (see `log_histogram`) is
+        fitted instead, which is less noisy in the tail and does not need the
+        raw data if the histogram was saved with the stats.
 
         Parameters
         ==========
@@ -185,11 +357,18 @@ class Observables:
 
             Axis scale of the x-axis and y-axis, respectively.
 
-        """
+        log_bins: bool, optional
 
-        data = getattr(self, observable)
+            If True, fits the log-binned probability distribution.
+            Defaults to False.
+
+        """
 
-        x, y = np.unique(data, return_counts=1)
+        if log_bins:
+            x, y = self.log_histogram(observable).pdf()
+        else:
+            data = getattr(self, observable)
+            x, y = np.unique(data[data > 0], return_counts=1)
 
         x = np.log10(x)
         y = np.log10(y)
@@ -205,36 +384,39 @@ class Observables:
             split_xy = [(x, y)]
             split_names = ()
 
-        fig = plt.figure(figsize=(20,10))
-        plt.text(10**0, 10**(len(split_xy)*0.1 + 0.2),
-                f"y = a$x^b$", fontsize=18)
-        text_position = iter(np.arange(len(split_xy)*0.1, 0.05, -0.1))
+        if plot:
+            fig = plt.figure(figsize=(20,10))
+            plt.text(10**0, 10**(len(split_xy)*0.1 + 0.2),
+                    f"y = a$x^b$", fontsize=18)
+            text_position = iter(np.arange(len(split_xy)*0.1, 0.05, -0.1))
 
         observable_title = (observable
                 .replace('_', ' ')
                 .title()
                 )
 
+        reg_tuple = namedtuple('reg_tuple', ['a', 'b', 'r'])
+
         regression_stats = []
         for split_x, split_y in split_xy:
 
             regression = stats.linregress(split_x, split_y)
 
-            if plot:
-                b, c, r = regression[:3]
+            b, c, r = regression[:3]
+            a = 10**c
 
+            if plot:
                 plt.plot(10**split_x, 10**split_y)
                 y_reg = b*split_x + c
                 plt.plot(10**split_x, 10**y_reg, color='r')
 
-                a = 10**c
-
                 plt.xscale(xscale)
                 plt.yscale(yscale)
 
                 plt.title(f"Powerlaw fit: {observable_title}", fontsize=28)
                 plt.xlabel(self.xlabels[observable], fontsize=16)
-                plt.ylabel("Frequency", fontsize=16)
+                plt.ylabel("Probability" if log_bins else "Frequency",
+                           fontsize=16)
 
                 text_pos = copy.copy(next(text_position))
                 reg_text = r"$\bf{" + next(split_names) + "}$: " if split_names else ""
@@ -248,8 +430,405 @@ class Observables:
                 plt.text(10**0.5, 10**text_pos, f"r = {r:.4f}",
                         fontsize=14)
 
-                reg_tuple = namedtuple('reg_tuple', ['a', 'b', 'r'])
-
-                regression_stats.append(reg_tuple(a, b, r))
+            regression_stats.append(reg_tuple(a, b, r))
 
         return regression_stats
+
+    def value_counts(self, observable, processes=None):
+        """ Returns the distinct positive values of any observable and the
+        number of times each occurs, counted chunk by chunk, and run by run
+        in parallel for several runs.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        processes: int, optional
+
+            Number of processes for several runs (see `map_runs`).
+            Defaults to None.
+
+        """
+
+        if len(self.runs) > 1:
+            parts = self.map_runs("value_counts", observable, processes)
+        else:
+            parts = [powerlaw_mle.value_counts(chunk)
+                     for chunk in self.iter_chunks(observable)]
+
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        values, counts = zip(*parts)
+        values, index = np.unique(np.concatenate(values), return_inverse=True)
+        counts = np.bincount(index, weights=np.concatenate(counts))
+
+        return values, counts.astype(np.int64)
+
+    def powerlaw_mle(self, observable, num_bootstrap=0, plot=False,
+                     processes=None, seed=None, **kwargs):
+        """ Fits a discrete power law, P(s) ~ s^(-alpha) for s >= xmin, to
+        any observable by maximum likelihood, with xmin chosen automatically
+        (see powerlaw_mle.fit). Returns the fit and, if `num_bootstrap` is
+        not 0, bootstrap confidence intervals of alpha and xmin (or else
+        None).
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to fit.
+
+        num_bootstrap: int, optional
+
+            Number of bootstrap resamples, which are fitted in a pool of
+            processes. Defaults to 0.
+
+        plot: bool, optional
+
+            If True, plots the survival function of the observable,
+            P(S >= s), with the fitted power law. Defaults to False.
+
+        processes: int, optional
+
+            Number of processes of the bootstrap, and of counting the values
+            of several runs. If None, one per CPU. Defaults to None.
+
+        seed: int, optional
+
+            Seed of the bootstrap resamples. Defaults to None.
+
+        Other keyword arguments are passed to powerlaw_mle.fit.
+
+        """
+
+        values, counts = self.value_counts(observable, processes)
+
+        fit = powerlaw_mle.fit(values, counts, **kwargs)
+
+        intervals = None
+        if num_bootstrap:
+            intervals = powerlaw_mle.bootstrap(values, counts,
+                                               num_bootstrap,
+                                               processes=processes,
+                                               seed=seed, **kwargs)
+
+        if plot:
+            survival = np.cumsum(counts[::-1])[::-1] / np.sum(counts)
+
+            tail = values >= fit.xmin
+            fitted = (fit.n_tail / np.sum(counts)
+                      * special.zeta(fit.alpha, values[tail])
+                      / special.zeta(fit.alpha, fit.xmin))
+
+            plt.figure(figsize=(20,10))
+            plt.plot(values, survival, 'o', markersize=4)
+            plt.plot(values[tail], fitted, color='r')
+            plt.xscale("log")
+            plt.yscale("log")
+
+            observable_title = (observable
+                    .replace('_', ' ')
+                    .title()
+                    )
+            plt.title(f"Powerlaw MLE fit: {observable_title}", fontsize=28)
+            plt.xlabel(self.xlabels[observable], fontsize=16)
+            plt.ylabel("P(S $\\geq$ s)", fontsize=16)
+
+            fit_text = (f"alpha = {fit.alpha:.3f} $\\pm$ {fit.sigma:.3f}, "
+                        f"xmin = {fit.xmin}")
+            if intervals is not None:
+                low, high = intervals.alpha_interval
+                fit_text += (f"\nbootstrap interval of alpha: "
+                             f"[{low:.3f}, {high:.3f}]")
+            plt.text(0.05, 0.05, fit_text, fontsize=14,
+                     transform=plt.gca().transAxes)
+
+        return fit, intervals
+
+    def sum_powers(self, observable, k, processes=None):
+        """ Returns the sum of the k-th powers of the values of any
+        observable, and the number of values, computed chunk by chunk, and
+        run by run in parallel for several runs. If the stats have no raw
+        data of the observable, the sum is estimated from its saved
+        log-binned histogram.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        k: float
+
+            The power.
+
+        processes: int, optional
+
+            Number of processes for several runs (see `map_runs`).
+            Defaults to None.
+
+        """
+
+        if Observables.columns[observable] not in self.data:
+            hist = self.log_histogram(observable)
+            return hist.moment(k) * hist.total, hist.total
+
+        if len(self.runs) > 1:
+            totals, counts = zip(*self.map_runs("sum_powers", observable,
+                                                processes, k=k))
+            return sum(totals), sum(counts)
+
+        total = 0.0
+        count = 0
+        for chunk in self.iter_chunks(observable):
+            total += np.sum(chunk.astype(float)**k)
+            count += len(chunk)
+
+        return total, count
+
+    def moment(self, observable, k, processes=None):
+        """ Returns the k-th moment, <s^k>, of the distribution of any
+        observable (see `sum_powers`).
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        k: float
+
+            Order of the moment.
+
+        processes: int, optional
+
+            Number of processes for several runs (see `map_runs`).
+            Defaults to None.
+
+        """
+
+        total, count = self.sum_powers(observable, k, processes)
+
+        return total / count
+
+    def log_binned_pdf(self, observable, bins_per_decade=10):
+        """ Returns the probability distribution of any observable estimated
+        on logarithmically spaced bins, as the bin centres and the probability
+        of each value in each bin (see `log_histogram`). Empty bins are left
+        out.
+
+        Parameters
+        ==========
+
+        observable: str
+
+            Observable to use.
+
+        bins_per_decade: int, optional
+
+            Number of bins in each decade. Defaults to 10.
+
+        """
+
+        return self.log_histogram(observable, bins_per_decade).pdf()
+
+class ConcatenatedStats(Mapping):
+
+    """ A read-only dictionary of the stats of several runs of the same
+    sandpile (such as replicas or checkpoints of one configuration), presented
+    as the stats of one run after the other.
+    Each column is concatenated lazily (see columnar.ConcatenatedColumn), the
+    time elapsed is the total of the runs, the grid is the average grid of
+    the runs and saved histograms are merged.
+    """
+
+    def __init__(self, stats):
+        """Present a list of stats as one, checking that they come from
+        sandpiles of the same dimensions and threshold.
+        """
+        self.stats = stats
+        self.columns = {}
+
+        for name in ("Dimensions", "Threshold"):
+            values = [np.atleast_1d(part[name]).tolist() for part in stats]
+            if any(value != values[0] for value in values):
+                raise ValueError(f"The runs have different {name.lower()}: "
+                                 f"{values}.")
+
+    def __getitem__(self, name):
+        if not all(name in part for part in self.stats):
+            raise KeyError(name)
+
+        if name in ("Dimensions", "Threshold"):
+            return self.stats[0][name]
+
+        if name == "Time Elapsed":
+            return sum(part[name] for part in self.stats)
+
+        if name == "Grid":
+            return np.mean([np.asarray(part[name]) for part in self.stats],
+                           axis=0)
+
+        if name == "Histograms":
+            return {
+                key: sum(histogram.LogHistogram.from_dict(part[name][key])
+                         for part in self.stats).to_dict()
+                for key in self.stats[0][name]
+                }
+
+        if name not in self.columns:
+            self.columns[name] = columnar.ConcatenatedColumn(self.stats, name)
+
+        return self.columns[name]
+
+    def __iter__(self):
+        return (name for name in self.stats[0]
+                if all(name in part for part in self.stats[1:]))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+def expand_runs(data):
+    """ Returns the list of stats files (or directories) given by a file
+    name, a glob pattern or a list of these, in order, with the matches of
+    each pattern sorted.
+
+    Parameters
+    ==========
+
+    data: str or list
+
+        Name of stats file, glob pattern, or list of these.
+
+    """
+
+    patterns = [data] if isinstance(data, str) else list(data)
+
+    runs = []
+    for pattern in patterns:
+        if os.path.exists(pattern):
+            runs.append(pattern)
+        else:
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError(f"No stats match {pattern}.")
+            runs.extend(matches)
+
+    return runs
+
+def reduce_run(fname, reduction, observable, kwargs):
+    """ Loads the stats of one run and returns a reduction (the name of an
+    Observables method) of any of its observables. This is run by the
+    processes of Observables.map_runs.
+    """
+
+    return getattr(Observables(fname), reduction)(observable, **kwargs)
+
+def finite_size_scaling(observables, sizes, observable,
+                        moments=np.arange(1.5, 4.01, 0.25)):
+    """ Estimates the exponents of the finite-size-scaling ansatz
+    P(s) = s^(-tau) f(s / L^D) of any observable from a moment analysis of
+    the same observable on grids of different sizes.
+
+    For each order k, the moments scale as <s^k> ~ L^(sigma_k), where
+    sigma_k = D(1 + k - tau). The slope of sigma_k against k estimates the
+    cutoff-scaling exponent D, and its intercept gives tau.
+
+    Returns a named tuple of D, tau, the array of sigma_k and the r value of
+    the fit of sigma_k against k.
+
+    Parameters
+    ==========
+
+    observables: list
+
+        Observables instances, one per grid size.
+
+    sizes: list
+
+        Linear size, L, of the grid of each Observables instance.
+
+    observable: str
+
+        Observable to use.
+
+    moments: array, optional
+
+        Orders, k, of the moments. These should be above tau - 1.
+        Defaults to 1.5, 1.75, ..., 4.
+
+    """
+
+    log_sizes = np.log10(sizes)
+
+    sigma = np.array([
+        stats.linregress(log_sizes,
+            [np.log10(ob.moment(observable, k)) for ob in observables])[0]
+        for k in moments
+        ])
+
+    regression = stats.linregress(moments, sigma)
+    D = regression[0]
+    tau = 1 - regression[1] / D
+
+    fss_tuple = namedtuple('fss_tuple', ['D', 'tau', 'sigma', 'r'])
+
+    return fss_tuple(D, tau, sigma, regression[2])
+
+def data_collapse(observables, sizes, observable, D, tau, bins_per_decade=10):
+    """ Produces a finite-size-scaling data collapse of any observable, by
+    plotting s^tau P(s) against s / L^D for grids of different sizes. If D
+    and tau are right, the curves of all sizes fall onto one curve.
+
+    Parameters
+    ==========
+
+    observables: list
+
+        Observables instances, one per grid size.
+
+    sizes: list
+
+        Linear size, L, of the grid of each Observables instance.
+
+    observable: str
+
+        Observable to plot.
+
+    D, tau: float
+
+        Exponents of the finite-size-scaling ansatz, for example from
+        `finite_size_scaling`.
+
+    bins_per_decade: int, optional
+
+        Number of logarithmic bins in each decade of each distribution.
+        Defaults to 10.
+
+    """
+
+    fig, ax = plt.subplots(figsize=(20,10))
+
+    for ob, size in zip(observables, sizes):
+        s, pdf = ob.log_binned_pdf(observable, bins_per_decade)
+        ax.plot(s / size**D, s**tau * pdf, 'o-', label=f"L = {size}")
+
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+
+    observable_title = (observable
+            .replace('_', ' ')
+            .title()
+            )
+    ax.set_title(f"Data Collapse: {observable_title} "
+                 f"(D = {D:.2f}, tau = {tau:.2f})", fontsize=28)
+    ax.set_xlabel(r"$s / L^D$", fontsize=16)
+    ax.set_ylabel(r"$s^{\tau} P(s)$", fontsize=16)
+    ax.legend(fontsize=14)
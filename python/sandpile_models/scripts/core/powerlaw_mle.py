@@ -0,0 +1,295 @@
+""" A script that contains the maximum-likelihood fit of a discrete power law,
+P(s) ~ s^(-alpha) for s >= xmin, to an observable, following Clauset,
+Shalizi and Newman (2009), "Power-law distributions in empirical data".
+The lower bound xmin is chosen by minimising the Kolmogorov-Smirnov distance
+between the data and the fit over all candidate values at once, and the
+uncertainty of the fit is estimated with a bootstrap in a pool of processes.
+All functions work on the distinct values of an observable and their counts,
+so their cost does not grow with the number of avalanches.
+"""
+
+
+""" IMPORTS """
+
+import numpy as np
+import os
+from scipy import optimize, special
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+
+""" FUNCTIONS """
+
+PowerLawFit = namedtuple('PowerLawFit',
+                            [
+                            'alpha',
+                            'xmin',
+                            'ks',
+                            'n_tail',
+                            'sigma'
+                            ]
+                            )
+
+PowerLawBootstrap = namedtuple('PowerLawBootstrap',
+                                [
+                                'alpha_interval',
+                                'xmin_interval',
+                                'alphas',
+                                'xmins'
+                                ]
+                                )
+
+def value_counts(data):
+    """ Returns the distinct positive values of an array of non-negative
+    integers and the number of times each occurs.
+
+    Parameters
+    ==========
+
+    data: array
+
+        The values of an observable.
+
+    """
+
+    data = np.asarray(data)
+
+    # Count by bincount unless the values are too large to index an array.
+    if len(data) and data.max() > max(2**24, 4 * len(data)):
+        values, counts = np.unique(data[data > 0], return_counts=True)
+        return values, counts
+
+    counts = np.bincount(data)
+    values = np.flatnonzero(counts)
+    values = values[values > 0]
+
+    return values, counts[values]
+
+def candidate_indices(tail_sizes, min_tail, max_candidates):
+    """ Returns the indices of the distinct values that are scanned as
+    candidates for xmin: those that leave at least `min_tail` values in the
+    tail, thinned to at most `max_candidates` log-spaced indices.
+    """
+
+    num_candidates = np.sum(tail_sizes >= min_tail)
+    if num_candidates <= max_candidates:
+        return np.arange(num_candidates)
+
+    indices = np.geomspace(1, num_candidates, max_candidates) - 1
+
+    return np.unique(indices.astype(int))
+
+def scan_xmin(values, counts, min_tail=50, max_candidates=500,
+              chunk_size=2**22):
+    """ Returns, for every candidate xmin, the approximate maximum-likelihood
+    exponent and the Kolmogorov-Smirnov distance of the fit to the tail, as
+    arrays (candidates, alphas, distances).
+    For all candidates at once, the size and the sum of the logarithms of
+    each tail are given by reverse cumulative sums, and the exponent by
+    alpha = 1 + n / sum(ln(x / (xmin - 1/2))). The distance compares the
+    survival function of each tail with (x - 1/2)^(1 - alpha), in chunks of
+    candidates of about `chunk_size` entries.
+
+    Parameters
+    ==========
+
+    values, counts: array
+
+        The distinct values (sorted) and their counts, as from
+        `value_counts`.
+
+    min_tail: int, optional
+
+        The least number of values in the tail of a candidate.
+        Defaults to 50.
+
+    max_candidates: int, optional
+
+        The most number of candidates scanned. Defaults to 500.
+
+    chunk_size: int, optional
+
+        Number of entries of each chunk of the scan. Defaults to 2**22.
+
+    """
+
+    values = values.astype(float)
+
+    # Size of the tail, and sum of the logarithms of the tail, from each
+    # value.
+    tail_sizes = np.cumsum(counts[::-1])[::-1]
+    tail_logs = np.cumsum((counts * np.log(values))[::-1])[::-1]
+
+    indices = candidate_indices(tail_sizes, min_tail, max_candidates)
+    xmins = values[indices]
+    alphas = 1 + tail_sizes[indices] / (tail_logs[indices]
+                                        - tail_sizes[indices]
+                                        * np.log(xmins - 0.5))
+
+    distances = np.empty(len(indices))
+    step = max(1, chunk_size // len(values))
+    for start in range(0, len(indices), step):
+        chunk = slice(start, start + step)
+        i = indices[chunk, None]
+
+        empirical = tail_sizes[None, :] / tail_sizes[i]
+        fitted = (((values[None, :] - 0.5) / (xmins[chunk, None] - 0.5))
+                  ** (1 - alphas[chunk, None]))
+
+        in_tail = np.arange(len(values))[None, :] >= i
+        distances[chunk] = np.where(in_tail, abs(empirical - fitted),
+                                    0).max(axis=1)
+
+    return xmins, alphas, distances
+
+def discrete_alpha(values, counts, xmin):
+    """ Returns the exact maximum-likelihood exponent of a discrete power law
+    fitted to the values from xmin, by maximising the log-likelihood
+    -n ln(zeta(alpha, xmin)) - alpha sum(ln(x)).
+
+    Parameters
+    ==========
+
+    values, counts: array
+
+        The distinct values and their counts.
+
+    xmin: int
+
+        Lower bound of the power law.
+
+    """
+
+    tail = values >= xmin
+    n = np.sum(counts[tail])
+    log_sum = np.sum(counts[tail] * np.log(values[tail]))
+
+    def negative_log_likelihood(alpha):
+        return n * np.log(special.zeta(alpha, xmin)) + alpha * log_sum
+
+    result = optimize.minimize_scalar(negative_log_likelihood,
+                                      bounds=(1 + 1e-6, 10),
+                                      method="bounded")
+
+    return result.x
+
+def fit(values, counts, xmin=None, min_tail=50, max_candidates=500):
+    """ Fits a discrete power law to the distinct values of an observable
+    and their counts, and returns a PowerLawFit of the exponent, xmin, the
+    Kolmogorov-Smirnov distance, the number of values in the tail and the
+    standard error of the exponent.
+    If xmin is None, it is chosen as the candidate with the smallest
+    distance (see `scan_xmin`). The exponent is then the exact discrete
+    maximum-likelihood estimate at xmin.
+
+    Parameters
+    ==========
+
+    values, counts: array
+
+        The distinct values (sorted) and their counts, as from
+        `value_counts`.
+
+    xmin: int, optional
+
+        Lower bound of the power law. Defaults to None.
+
+    min_tail, max_candidates: int, optional
+
+        As in `scan_xmin`. Defaults to 50 and 500.
+
+    """
+
+    if xmin is None:
+        xmins, alphas, distances = scan_xmin(values, counts, min_tail,
+                                             max_candidates)
+        if not len(xmins):
+            raise ValueError(f"There are fewer than {min_tail} values to "
+                             "fit a power law to.")
+
+        best = np.argmin(distances)
+        xmin, ks = int(xmins[best]), distances[best]
+    else:
+        ks = np.nan
+
+    alpha = discrete_alpha(values, counts, xmin)
+    n_tail = int(np.sum(counts[values >= xmin]))
+
+    return PowerLawFit(alpha, xmin, ks, n_tail, (alpha - 1) / np.sqrt(n_tail))
+
+def bootstrap_fits(values, counts, seeds, fit_kwargs):
+    """ Returns the exponents and xmins fitted to resamples of the data, one
+    resample for each seed. A resample draws as many values as the data, with
+    replacement, as a multinomial draw of the counts of the distinct values.
+    """
+
+    probabilities = counts / np.sum(counts)
+
+    alphas, xmins = [], []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        resample = rng.multinomial(np.sum(counts), probabilities)
+
+        drawn = resample > 0
+        result = fit(values[drawn], resample[drawn], **fit_kwargs)
+        alphas.append(result.alpha)
+        xmins.append(result.xmin)
+
+    return alphas, xmins
+
+def bootstrap(values, counts, num_bootstrap=100, confidence=0.95,
+              processes=None, seed=None, **fit_kwargs):
+    """ Estimates confidence intervals of the exponent and xmin of the fit of
+    a discrete power law by refitting resamples of the data, split across a
+    pool of processes. Returns a PowerLawBootstrap of the intervals and the
+    fitted exponents and xmins of the resamples.
+
+    Parameters
+    ==========
+
+    values, counts: array
+
+        The distinct values (sorted) and their counts, as from
+        `value_counts`.
+
+    num_bootstrap: int, optional
+
+        Number of resamples. Defaults to 100.
+
+    confidence: float, optional
+
+        Confidence level of the intervals. Defaults to 0.95.
+
+    processes: int, optional
+
+        Number of processes in the pool. If None, one per CPU.
+        Defaults to None.
+
+    seed: int, optional
+
+        Seed of the resamples. Defaults to None.
+
+    Other keyword arguments are passed to `fit`.
+
+    """
+
+    seeds = np.random.SeedSequence(seed).spawn(num_bootstrap)
+
+    num_chunks = min(num_bootstrap, processes or os.cpu_count())
+    chunks = [seeds[i::num_chunks] for i in range(num_chunks)]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(bootstrap_fits,
+                                [values] * num_chunks,
+                                [counts] * num_chunks,
+                                chunks,
+                                [fit_kwargs] * num_chunks))
+
+    alphas = np.concatenate([result[0] for result in results])
+    xmins = np.concatenate([result[1] for result in results])
+
+    tails = 100 * np.array([(1 - confidence) / 2, (1 + confidence) / 2])
+
+    return PowerLawBootstrap(tuple(np.percentile(alphas, tails)),
+                             tuple(np.percentile(xmins, tails)),
+                             alphas, xmins)
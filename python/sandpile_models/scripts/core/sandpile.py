@@ -1,5 +1,7 @@
 """ A script that contains the basic sandpile model and two extensions of the
 basic model. The two extensions are subclasses to the basic sandpile class.
+Each model is defined by its toppling rule, which the basic sandpile class
+runs for all three.
 """
 
 
@@ -9,10 +11,143 @@ from itertools import *
 import numpy as np
 import matplotlib.pyplot as plt
 import pickle
+import os
+
+import columnar
+import histogram
 
 
 """ FUNCTIONS """
 
+class GrowableArray:
+
+    """ A list-like record of numbers stored in a numpy array that doubles in
+    capacity whenever it fills up, so appending is cheap on average and the
+    recorded numbers can be viewed as an array without copying them.
+    Indexing, slicing, iterating and len() work as they do for a list.
+    """
+
+    def __init__(self, dtype=int, capacity=16):
+        """Initialize an empty record of the given dtype."""
+        self.array = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None and not copy:
+            return self.view()
+
+        return np.array(self.view(), dtype=dtype)
+
+    def __repr__(self):
+        return f"GrowableArray({self.view().tolist()})"
+
+    def view(self):
+        """Return the recorded numbers as an array that shares its memory with
+        the record. The view is only valid until the next append or extend.
+        """
+
+        return self.array[:self.size]
+
+    def reserve(self, capacity):
+        """Grow the storage, by doubling, to hold at least `capacity` numbers.
+        """
+
+        if capacity > len(self.array):
+            new_capacity = max(capacity, 2 * len(self.array))
+            array = np.empty(new_capacity, dtype=self.array.dtype)
+            array[:self.size] = self.view()
+            self.array = array
+
+    def append(self, value):
+        """Record one number."""
+
+        if self.size == len(self.array):
+            self.reserve(self.size + 1)
+
+        self.array[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        """Record an array (or iterable) of numbers."""
+
+        values = np.asarray(values, dtype=self.array.dtype)
+
+        self.reserve(self.size + len(values))
+        self.array[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+
+# Row and column offsets of the 8 neighbours of a cell.
+EIGHT_NEIGHBOURS = [(di, dj) for di in range(-1, 2) for dj in range(-1, 2)
+                    if (di, dj) != (0, 0)]
+
+
+class ToppleRule:
+
+    """ A TOPPLING RULE:
+    This class declares when a cell of a sandpile topples and where its grains
+    go, so that the same relaxation engine (the SandPile class) can run any
+    sandpile model.
+
+    Details:
+    - instability: "height" if a cell topples when it holds at least the
+    threshold number of grains, or "difference" if a cell topples when it
+    holds at least the threshold number of grains more than any of its
+    neighbours.
+    - offsets: the row and column offsets of the neighbours of a cell. A
+    "height" topple sends one grain to every neighbour, while a "difference"
+    topple sends one grain to every neighbour that it exceeds by at least the
+    threshold.
+    - boundary: "open" if grains sent outside of the grid are lost (and the
+    outside of the grid holds no grains), or "closed" if the cells on the
+    edge of the grid have no neighbours outside of it.
+
+    """
+
+    def __init__(self, instability, offsets, boundary="open"):
+        """Initialize a toppling rule."""
+        if instability not in ("height", "difference"):
+            raise ValueError(f"Unknown instability condition: {instability}")
+        if boundary not in ("open", "closed"):
+            raise ValueError(f"Unknown boundary behaviour: {boundary}")
+
+        self.instability = instability
+        self.offsets = np.array(offsets)
+        self.boundary = boundary
+
+        # Number of steps from a cell to its furthest neighbour.
+        self.reach = np.max(np.abs(self.offsets))
+
+        # The offsets as pairs of Python integers, to topple a single cell
+        # without any arrays, and whether they are the whole 3x3 block
+        # around a cell, which a "height" topple can update in one slice.
+        self.neighbours = [tuple(offset) for offset in self.offsets.tolist()]
+        self.block = sorted(self.neighbours) == sorted(EIGHT_NEIGHBOURS)
+
+        # The grid left by "height" topples does not depend on their order
+        # (the Abelian property), so they can be toppled all at once.
+        self.abelian = instability == "height"
+
+        # Offsets (in row-major order) of the cells whose stability can change
+        # when a cell topples, which are the only cells checked after each
+        # sweep: the cell and its neighbours, whose grains change, and for a
+        # "difference" rule also the cells that have these as neighbours,
+        # whose differences change.
+        changed = np.vstack([[0, 0], self.offsets])
+        if not self.abelian:
+            changed = (changed[:, None] - changed[None, :]).reshape(-1, 2)
+        self.frontier_offsets = np.unique(changed, axis=0)
+
+
 class SandPile:
 
     """ THE BASIC SANDPILE MODEL:
@@ -27,29 +162,102 @@ class SandPile:
 
     """
 
-    def __init__(self, length, width, threshold=4):
-        """Initialize a sandpile with the specified length and width."""
+    rule = ToppleRule("height", [(-1, 0), (1, 0), (0, -1), (0, 1)])
+
+    # The cells around a sweep are checked only while they are fewer than
+    # this fraction of the grid, and the whole grid is checked otherwise.
+    frontier_fraction = 1 / 8
+
+    # Largest number of cells toppled one at a time by `topple_cells` with an
+    # Abelian rule (and of drops made one at a time by
+    # `drop_until_unstable`), and of cells (or drops) checked one at a time
+    # by `unstable_cells` (or `first_unstable_drop`) with a "height" rule,
+    # below which array operations cost more than they save.
+    scalar_cells = 8
+    scalar_checks = 64
+
+    # Records of the sandpile, which are appended to checkpoint files or
+    # streamed to disk, and the names of their stats.
+    records = {
+        "mass_history": "Mass History",
+        "aval_duration": "Duration",
+        "topples": "Topples",
+        "area": "Area",
+        "lost_mass": "Lost mass",
+        "distance": "Distance"
+        }
+
+    def __init__(self, length, width, threshold=4, debug=False):
+        """Initialize a sandpile with the specified length and width.
+        In debug mode, the running mass of the grid is checked against the
+        sum of the grid every time it is read.
+        """
         self.length = length
         self.width = width
         self.threshold = threshold
+        self.debug = debug
 
         self.grid = np.zeros((length, width), dtype=int)
 
+        # Mask of the cells toppled so far in the current avalanche, reused
+        # by every avalanche.
+        self.visited = np.zeros((length, width), dtype=bool)
+
+        # Flat indices of the only cells that can be unstable, which are known
+        # once the grid has been stable (an empty array when it still is), or
+        # None if the whole grid has to be checked.
+        self.candidates = None
+
+        # Flat index steps from a cell to its neighbours and to its frontier
+        # (see ToppleRule), with masks of the steps of every cell that stay
+        # inside the grid, so the cells around a sweep are found by indexing.
+        self.neighbour_steps, self.neighbour_inside = self.offset_table(
+                                                        self.rule.offsets)
+        self.frontier_steps, self.frontier_inside = self.offset_table(
+                                                self.rule.frontier_offsets)
+
+        # Number of grains each cell loses in a "height" topple, and how many
+        # of them fall off the grid: one per neighbour for an open boundary,
+        # or one per neighbour inside the grid for a closed boundary.
+        inside = np.count_nonzero(self.neighbour_inside, axis=0)
+        if self.rule.boundary == "closed":
+            self.topple_size = inside
+            self.topple_loss = np.zeros_like(inside)
+        else:
+            self.topple_size = np.full_like(inside, len(self.rule.offsets))
+            self.topple_loss = self.topple_size - inside
+
+        # Running mass of the grid, updated as grains are dropped, toppled and
+        # lost so that recording the mass does not need to sum the grid.
+        self._mass = 0
+
         # Track the overall mass of the sand pile overtime. The array will
         # store the masses at each time step.
         # Use len(self.mass_history) to track the number of time steps.
-        self.mass_history = []
+        self.mass_history = GrowableArray()
 
         # Track the time of the course of the sandpile.
         self.time = 0
 
         # Record the observables of each avalanche.
-        self.aval_duration = []
+        self.aval_duration = GrowableArray()
         self.num_of_avalanches = 0
-        self.topples = []
-        self.area = []
-        self.lost_mass = []
-        self.distance = []
+        self.topples = GrowableArray()
+        self.area = GrowableArray()
+        self.lost_mass = GrowableArray()
+        self.distance = GrowableArray()
+
+        # Length of each record at the last checkpoint, or None if this
+        # sandpile has not been checkpointed yet.
+        self.checkpoint_sizes = None
+
+        # Directory the records are streamed to, or None if they are kept in
+        # memory.
+        self.stream = None
+
+        # Log-binned histograms of the avalanche stats, by name, which are
+        # updated by every avalanche once tracked.
+        self.histograms = {}
 
     def plot_mass(self, start_time=None, end_time=None):
         """ Plots the mass of the grid over its lifetime.
@@ -71,16 +279,31 @@ class SandPile:
             end_time += 1
 
         time = np.arange(self.time)[start_time:end_time]
-        mass = np.array(self.mass_history)[start_time:end_time]
+        mass = self.mass_history[start_time:end_time]
 
         plt.plot(time, mass)
 
-    def increment_time(self):
+    def increment_time(self, masses=None):
         """ Call this function to record the mass whenever there is an increment
         of time added to the course of the sandpile.
+
+        Parameters
+        ==========
+
+        masses: array, optional
+
+            The masses at each of several consecutive time steps, which are
+            all recorded at once. If None, one time step is recorded with the
+            current mass. Defaults to None.
+
         """
-        self.time += 1
-        self.mass_history.append(np.sum(self.grid))
+
+        if masses is None:
+            self.time += 1
+            self.mass_history.append(self.mass())
+        else:
+            self.time += len(masses)
+            self.mass_history.extend(masses)
 
 
     def drop_sand(self, n=1, cell=None):
@@ -118,15 +341,224 @@ class SandPile:
             i = np.random.randint(self.length)
             j = np.random.randint(self.width)
 
-        self.grid[i][j] += np.random.choice(n) if type(n) != int else n
+        grains = np.random.choice(n) if type(n) != int else n
+        self.grid[i][j] += grains
+        self._mass += grains
+        self.candidates = None
 
         # Increment time by 1 and update internal mass_history.
         self.increment_time()
 
+        return i, j
+
+    def draw_drops(self, num_drops, n=1, cell=None):
+        """Returns the row and column indices of the cells and the number of
+        grains of `num_drops` drops of sand, without dropping them. The random
+        numbers are drawn in the same order as `num_drops` calls to
+        `drop_sand`, so the drops are the same as those it would make.
+
+        Parameters
+        ==========
+
+        num_drops: int
+
+            The number of drops to draw.
+
+        n: int or iter
+
+            The number of grains of sand of each drop, as in `drop_sand`.
+            Defaults to 1.
+
+        cell: list
+
+            The cells on which grains of sand may be dropped, as in
+            `drop_sand`. Defaults to None.
+
+        """
+
+        bounds = [len(cell)] if cell else [self.length, self.width]
+        if type(n) != int:
+            choices = np.arange(n) if np.ndim(n) == 0 else np.array(n)
+            bounds.append(len(choices))
+
+        draws = np.random.randint(np.tile(bounds, num_drops))
+        draws = draws.reshape(num_drops, len(bounds))
+
+        if cell:
+            i, j = np.array(cell)[draws[:, 0]].T
+        else:
+            i, j = draws[:, 0], draws[:, 1]
+
+        if type(n) != int:
+            grains = choices[draws[:, -1]]
+        else:
+            grains = np.full(num_drops, n)
+
+        return i, j, grains
+
+    def drop_until_unstable(self, n=1, cell=None, block=256):
+        """Drop grains of sand, as repeated calls to `drop_sand` would, until
+        at least one cell is unstable, so the time, mass history and random
+        number stream are the same as dropping the grains one at a time.
+        The drops are made in blocks that double in size (up to `block`)
+        while none of them make a cell unstable. The drops of blocks of up to
+        `scalar_cells` drops are made one at a time with `drop_sand`, which
+        is all it takes in the critical state, where an avalanche starts
+        every few drops. Larger blocks are drawn at once and the first drop
+        to make a cell reach the threshold is found with array operations,
+        and only if it is not the last drop of its block is the random
+        number stream rewound to end at it. The dropped cell that is unstable
+        is kept in `candidates`, so the next avalanche starts from it without
+        checking the whole grid.
+        Returns the number of drops, which is zero if the grid is already
+        unstable.
+
+        Parameters
+        ==========
+
+        n: int or iter
+
+            The number of grains of sand of each drop, as in `drop_sand`.
+            Defaults to 1.
+
+        cell: list
+
+            The cells on which grains of sand may be dropped, as in
+            `drop_sand`. Defaults to None.
+
+        block: int
+
+            The largest number of drops drawn at once. Defaults to 256.
+
+        """
+
+        if len(self.unstable_cells(self.candidates)):
+            return 0
+
+        num_of_drops = 0
+        size = 1
+        while size <= self.scalar_cells:
+            for _ in range(size):
+                i, j = self.drop_sand(n, cell)
+                num_of_drops += 1
+
+                # A drop can only make the cell it lands on unstable.
+                index = np.array([i * self.width + j])
+                if len(self.unstable_cells(index)):
+                    self.candidates = index
+                    return num_of_drops
+            size *= 2
+
+        while True:
+            size = min(size, block)
+
+            state = np.random.get_state()
+            i, j, grains = self.draw_drops(size, n, cell)
+
+            first = self.first_unstable_drop(i, j, grains)
+            drops = size if first is None else first + 1
+            if drops < size:
+                # Rewind the random number stream to end at the first
+                # unstable drop.
+                np.random.set_state(state)
+                self.draw_drops(drops, n, cell)
+
+            masses = self.mass() + np.cumsum(grains[:drops])
+            np.add.at(self.grid, (i[:drops], j[:drops]), grains[:drops])
+            self._mass = masses[-1]
+            self.increment_time(masses)
+
+            num_of_drops += drops
+            if first is not None:
+                self.candidates = np.array([i[first] * self.width + j[first]])
+                return num_of_drops
+
+            size *= 2
+
+    def first_unstable_drop(self, i, j, grains):
+        """Returns the index of the first of the given drops to make a cell
+        unstable when they are dropped in turn on the (stable) grid, or None
+        if none of them do. The grid is left unchanged.
+
+        Parameters
+        ==========
+
+        i, j, grains: array
+
+            Row and column indices of the cells and the number of grains of
+            the drops, as returned by `draw_drops`.
+
+        """
+
+        index = i * self.width + j
+
+        if (self.rule.instability == "height"
+                and len(index) <= self.scalar_checks):
+            # Make the few drops in turn on a dictionary of the heights of
+            # the dropped cells.
+            grid = self.grid.reshape(-1)
+            heights = {}
+            drops = zip(index.tolist(), grains.tolist())
+            for drop, (cell, grains_of_drop) in enumerate(drops):
+                height = heights.get(cell, grid.item(cell)) + grains_of_drop
+                if height >= self.threshold:
+                    return drop
+                heights[cell] = height
+
+            return None
+
+        if self.rule.instability == "height":
+            # Height of the dropped cell after each drop, accounting for
+            # earlier drops on the same cell.
+            order = np.argsort(index, kind="stable")
+            sorted_index = index[order]
+            sorted_grains = np.cumsum(grains[order])
+
+            # Starts and sizes of the runs of drops on the same cell.
+            starts = np.flatnonzero(np.diff(sorted_index, prepend=-1))
+            sizes = np.diff(starts, append=len(index))
+            earlier_grains = sorted_grains[starts] - grains[order][starts]
+            sorted_grains -= np.repeat(earlier_grains, sizes)
+
+            heights = np.empty(len(index), dtype=self.grid.dtype)
+            heights[order] = self.grid.flat[sorted_index] + sorted_grains
+
+            unstable = np.flatnonzero(heights >= self.threshold)
+            return unstable[0] if len(unstable) else None
+
+        # A drop can only make the cell it lands on unstable, but whether it
+        # does depends on the earlier drops on its neighbours, so the drops
+        # are made in turn and then taken back.
+        first = None
+        for drop in range(len(i)):
+            self.grid[i[drop], j[drop]] += grains[drop]
+
+            if len(self.unstable_cells(index[drop:drop + 1])):
+                first = drop
+                break
+
+        np.subtract.at(self.grid, (i[:drop + 1], j[:drop + 1]),
+                       grains[:drop + 1])
+
+        return first
+
     def mass(self):
         """Return the mass of the grid."""
 
-        return np.sum(self.grid)
+        if self.debug and self._mass != np.sum(self.grid):
+            raise RuntimeError(f"Running mass ({self._mass}) does not match "
+                               f"the mass of the grid ({np.sum(self.grid)}).")
+
+        return self._mass
+
+    def recount_mass(self):
+        """Recount the running mass from the grid, and check the whole grid
+        for unstable cells next. Call this function after changing the grid
+        directly rather than through the sandpile methods.
+        """
+
+        self._mass = np.sum(self.grid)
+        self.candidates = None
 
     def average_mass(self):
         """Return the average mass (or height) of the grid."""
@@ -141,7 +573,165 @@ class SandPile:
         class.
         """
 
-        return list(zip(*np.where(self.grid >= self.threshold)))
+        return [divmod(index, self.width)
+                for index in self.unstable_cells().tolist()]
+
+    def unstable_cells(self, index=None):
+        """Returns the flat (row-major) indices, in increasing order, of the
+        cells to topple under the toppling rule: the cells that contain a
+        number of grains at or over the threshold, or the cells with
+        neighbours that satisfy the condition that the difference in grains
+        is at least the threshold.
+
+        Parameters
+        ==========
+
+        index: array, optional
+
+            Flat indices of the cells to check, which may repeat. If None,
+            every cell of the grid is checked. Defaults to None.
+
+        """
+
+        if index is None:
+            if self.rule.instability == "height":
+                unstable = self.grid >= self.threshold
+            else:
+                differences = self.difference_field()
+                unstable = np.any(differences >= self.threshold, axis=0)
+
+            return np.flatnonzero(unstable)
+
+        if (self.rule.instability == "height"
+                and len(index) <= self.scalar_checks):
+            grid = self.grid.reshape(-1)
+            return np.array(sorted({cell for cell in index.tolist()
+                                    if grid.item(cell) >= self.threshold}),
+                            dtype=index.dtype)
+
+        if self.rule.instability == "height":
+            unstable = self.grid.reshape(-1)[index] >= self.threshold
+        else:
+            differences = self.cell_differences(index)
+            unstable = np.any(differences >= self.threshold, axis=0)
+
+        # Keep each of the unstable cells once, in row-major order.
+        index = np.sort(index[unstable])
+        if len(index) > 1:
+            index = index[np.concatenate(([True], index[1:] != index[:-1]))]
+
+        return index
+
+    def offset_table(self, offsets):
+        """Returns the flat index steps of the given row and column offsets,
+        along with a mask of shape (k, length * width) of the offsets of each
+        cell that fall inside the grid.
+
+        Parameters
+        ==========
+
+        offsets: array
+
+            Row and column offsets, of shape (k, 2).
+
+        """
+
+        rows, cols = np.divmod(np.arange(self.length * self.width), self.width)
+        ii = rows + offsets[:, :1]
+        jj = cols + offsets[:, 1:]
+        inside = (0 <= ii) & (ii < self.length) & (0 <= jj) & (jj < self.width)
+
+        return offsets[:, 0] * self.width + offsets[:, 1], inside
+
+    def neighbour_cells(self, index):
+        """Returns the flat indices of the neighbours of each of the given
+        cells, as an array of shape (k, n) in the order of the rule offsets,
+        along with a mask of the neighbours inside the grid. The indices of
+        neighbours outside of the grid are meaningless.
+
+        Parameters
+        ==========
+
+        index: array
+
+            Flat indices of the cells.
+
+        """
+
+        return (index + self.neighbour_steps[:, None],
+                self.neighbour_inside[:, index])
+
+    def difference_field(self):
+        """Returns the difference in grains between every cell and each of its
+        neighbouring cells as an array of shape (k, length, width), in the
+        order of the rule offsets. Neighbours that fall outside of an open
+        grid hold no grains, while those outside of a closed grid are given
+        the lowest possible difference so they never cause a topple.
+        """
+
+        r = self.rule.reach
+        padded = np.pad(self.grid, r)
+        inside = np.pad(np.ones(self.grid.shape, dtype=bool), r)
+
+        shifted = lambda a, di, dj : a[r + di:r + di + self.length,
+                                       r + dj:r + dj + self.width]
+
+        differences = np.stack([self.grid - shifted(padded, di, dj)
+                                for di, dj in self.rule.offsets])
+
+        if self.rule.boundary == "closed":
+            outside = np.stack([~shifted(inside, di, dj)
+                                for di, dj in self.rule.offsets])
+            differences[outside] = np.iinfo(differences.dtype).min
+
+        return differences
+
+    def cell_differences(self, index):
+        """Returns the difference in grains between each of the given cells
+        and each of its neighbouring cells as an array of shape (k, n), in
+        the same way as `difference_field`.
+
+        Parameters
+        ==========
+
+        index: array
+
+            Flat indices of the cells.
+
+        """
+
+        grid = self.grid.reshape(-1)
+        neighbours, inside = self.neighbour_cells(index)
+        vals = np.where(inside, grid[np.where(inside, neighbours, index)], 0)
+
+        differences = grid[index] - vals
+
+        if self.rule.boundary == "closed":
+            differences[~inside] = np.iinfo(differences.dtype).min
+
+        return differences
+
+    def frontier(self, index):
+        """Returns the flat indices of every cell whose stability may have
+        changed after toppling the given cells, which are the cells at the
+        frontier offsets of the rule from a toppled cell, some of them more
+        than once. Returns None if there are so many of them that checking
+        the whole grid is quicker.
+
+        Parameters
+        ==========
+
+        index: array
+
+            Flat indices of the toppled cells.
+
+        """
+
+        steps = self.frontier_steps
+        if len(index) * len(steps) > self.frontier_fraction * self.grid.size:
+            return None
+
+        return (index + steps[:, None])[self.frontier_inside[:, index]]
 
     def topple(self, cell, increment_time=False):
         """Topple the specified cell.
@@ -159,22 +749,215 @@ class SandPile:
         """
 
         i, j = cell
+        grid = self.grid
+        open_boundary = self.rule.boundary == "open"
+        self.candidates = None
+
+        if self.rule.instability == "height" and self.rule.block:
+            # Add a grain to the 3x3 block around the cell, clipped to the
+            # grid, and take the grain added to the cell back along with its
+            # 8 grains.
+            block = grid[max(i - 1, 0):i + 2, max(j - 1, 0):j + 2]
+            block += 1
+            if open_boundary:
+                grid[i, j] -= 9
+                self._mass -= 9 - block.size
+            else:
+                grid[i, j] -= block.size
+
+        elif self.rule.instability == "height":
+            moved = 0
+            for di, dj in self.rule.neighbours:
+                ii, jj = i + di, j + dj
+                if 0 <= ii < self.length and 0 <= jj < self.width:
+                    grid[ii, jj] += 1
+                    moved += 1
+
+            lost = len(self.rule.neighbours) - moved if open_boundary else 0
+            grid[i, j] -= moved + lost
+            self._mass -= lost
 
-        self.grid[i][j] -= 4
-
-        if i != 0:
-            self.grid[i-1][j] += 1
-        if i != self.length - 1:
-            self.grid[i+1][j] += 1
-        if j != 0:
-            self.grid[i][j-1] += 1
-        if j != self.width - 1:
-            self.grid[i][j+1] += 1
+        else:
+            # Move one grain to each neighbour exceeded by at least the
+            # threshold, where the neighbours outside of an open grid hold no
+            # grains. All the moves are decided before any grain moves.
+            height = grid.item(i, j)
+            moves = []
+            lost = 0
+            for di, dj in self.rule.neighbours:
+                ii, jj = i + di, j + dj
+                if 0 <= ii < self.length and 0 <= jj < self.width:
+                    if height - grid.item(ii, jj) >= self.threshold:
+                        moves.append((ii, jj))
+                elif open_boundary and height >= self.threshold:
+                    lost += 1
+
+            for ii, jj in moves:
+                grid[ii, jj] += 1
+            grid[i, j] -= len(moves) + lost
+            self._mass -= lost
 
         if increment_time:
             self.increment_time()
 
-    def avalanche(self, increment_time=False):
+    def topple_cells(self, index, increment_time=False, times=None):
+        """Topple each of the specified cells once. For an Abelian rule, the
+        cells are all toppled in one array operation, and the grid ends up the
+        same as when toppling them one at a time in row-major order, which is
+        how a few cells (at most `scalar_cells`) are toppled. Otherwise, the
+        grains moved by a topple depend on the grid at the time of the
+        topple, so the cells are toppled one at a time in row-major order.
+
+        Parameters
+        ==========
+
+        index: array
+
+            Flat indices of the (distinct) cells to topple, in row-major
+            order.
+
+        increment_time: bool
+
+            Whether to increment one time step per topple or not, recording
+            the mass after each topple in turn. Defaults to False.
+
+        times: array, optional
+
+            The number of times to topple each cell in a row. If None, each
+            cell is toppled once. Defaults to None.
+
+        """
+
+        self.candidates = None
+
+        if not self.rule.abelian or len(index) <= self.scalar_cells:
+            times = [1] * len(index) if times is None else times.tolist()
+            for cell, num_of_topples in zip(index.tolist(), times):
+                for _ in range(num_of_topples):
+                    self.topple(divmod(cell, self.width), increment_time)
+            return
+
+        lost = self.topple_loss[index]
+        if times is not None:
+            lost = np.repeat(lost, times)
+
+        # The masses after each topple are found from the mass before the
+        # grid changes, so the running mass always matches the grid.
+        if increment_time:
+            masses = self.mass() - np.cumsum(lost)
+
+        grid = self.grid.reshape(-1)
+        neighbours, inside = self.neighbour_cells(index)
+
+        if times is None:
+            grid[index] -= self.topple_size[index]
+            np.add.at(grid, neighbours[inside], 1)
+        else:
+            grid[index] -= self.topple_size[index] * times
+            np.add.at(grid, neighbours[inside],
+                      np.broadcast_to(times, neighbours.shape)[inside])
+
+        self._mass -= np.sum(lost)
+        if increment_time:
+            self.increment_time(masses)
+
+    def topple_counts(self, index):
+        """Returns the number of times each of the specified cells can topple
+        in a row before it holds fewer grains than the threshold. By the
+        Abelian property of the sandpile, toppling a cell this many times at
+        once leads to the same stable grid as toppling it once per sweep.
+
+        If the rule is not Abelian, the grains moved by a topple depend on
+        the grid left by the previous topples, so each cell may only topple
+        once per sweep and the counts are all one.
+
+        Parameters
+        ==========
+
+        index: array
+
+            Flat indices of the (unstable) cells.
+
+        """
+
+        if not self.rule.abelian:
+            return np.ones(len(index), dtype=int)
+
+        excess = self.grid.reshape(-1)[index] - self.threshold
+
+        return excess // self.topple_size[index] + 1
+
+    def relax(self, multi_topple=True):
+        """Topple cells until the grid is stable, without recording any time,
+        mass history or avalanche stats. Returns the number of topples.
+
+        Parameters
+        ==========
+
+        multi_topple: bool
+
+            If True, each unstable cell is toppled as many times in a row as
+            it can in each sweep (see `topple_counts`). Defaults to True.
+
+        """
+
+        num_of_topples = 0
+
+        cells_to_topple = self.unstable_cells(self.candidates)
+        while len(cells_to_topple):
+            if multi_topple:
+                times = self.topple_counts(cells_to_topple)
+            else:
+                times = np.ones(len(cells_to_topple), dtype=int)
+
+            self.topple_cells(cells_to_topple, times=times)
+            num_of_topples += int(np.sum(times))
+
+            cells_to_topple = self.unstable_cells(
+                                self.frontier(cells_to_topple))
+
+        self.candidates = np.empty(0, dtype=int)
+
+        return num_of_topples
+
+    def burn_in(self, num_drops, n=1, cell=None):
+        """Drop grains of sand `num_drops` times, all at once, and then relax
+        the grid once with multiple topples. This quickly brings a sandpile
+        to its critical state before avalanches are recorded, and does not
+        record any time, mass history or avalanche stats.
+        Returns the number of topples.
+
+        Parameters
+        ==========
+
+        num_drops: int
+
+            The number of times grains of sand are dropped.
+
+        n: int or iter
+
+            The number of grains of sand of each drop, as in `drop_sand`.
+            Defaults to 1.
+
+        cell: list
+
+            The cells on which grains of sand may be dropped, as in
+            `drop_sand`. Defaults to None.
+
+        """
+
+        i, j, grains = self.draw_drops(num_drops, n, cell)
+        np.add.at(self.grid, (i, j), grains)
+        self._mass += np.sum(grains)
+
+        if self.candidates is not None:
+            self.candidates = np.concatenate((self.candidates,
+                                              i * self.width + j))
+
+        return self.relax()
+
+    def avalanche(self, increment_time=False, frontier=True, vectorized=True,
+                  multi_topple=False):
         """Run the avalanche causing all cells to topple and store the stats of
         the avalanche in the appropriate variables.
         For extended sandpile, avalanches are run when the difference between
@@ -191,47 +974,106 @@ class SandPile:
             If False, time is only incremented at the end of the avalanche.
             Defaults to False.
 
+        frontier: bool
+
+            If True, only the cells around the cells toppled in the previous
+            sweep are checked for the next sweep, so the cost of an avalanche
+            scales with its size rather than with the size of the grid.
+            If False, the whole grid is checked after every sweep.
+            Both give identical avalanches. Defaults to True.
+
+        vectorized: bool
+
+            If True, all the cells of a sweep are toppled at once with
+            `topple_cells`. If False, they are toppled one at a time with
+            `topple`. Both give identical avalanches. Defaults to True.
+
+        multi_topple: bool
+
+            If True, each cell of a sweep is toppled as many times in a row as
+            it can (see `topple_counts`), and every one of these topples is
+            counted. The grid, topples, area, distance and lost mass of the
+            avalanche are unchanged, but it takes fewer sweeps, so its
+            duration is shorter unless time is incremented at every topple.
+            Defaults to False.
+
         """
 
         # Initialize avalanche statistics.
         num_of_topples = 0
-        toppled_cells = []
+        area = 0
+        max_distance = 0
         start_mass = self.mass()
         start_time = self.time
 
         # Record first toppled cell for calculation of distance.
-        first_toppled_cell = []
-
-        # Topple cells until all cells have less than the threshold no.
-        cells_to_topple = self.check_threshold()
-        while cells_to_topple:
-            # Topple each cell and update avalanche statistics.
-            for cell in cells_to_topple:
-                self.topple(cell, increment_time)
+        first_row, first_col = None, None
 
-                if not first_toppled_cell:
-                    first_toppled_cell.append(cell[0])
-                    first_toppled_cell.append(cell[1])
+        # Cells toppled for the first time in each sweep, which are unmarked
+        # from the visited mask at the end of the avalanche.
+        new_cells = []
 
-                toppled_cells.append(cell)
-                num_of_topples += 1
+        # Topple cells until all cells have less than the threshold no.
+        # The first sweep only checks the cells that can be unstable, if they
+        # are known (see `drop_until_unstable`).
+        visited = self.visited.reshape(-1)
 
-            cells_to_topple = self.check_threshold()
+        cells_to_topple = self.unstable_cells(self.candidates)
+        while len(cells_to_topple):
+            # Topple each cell and update avalanche statistics.
+            if multi_topple:
+                times = self.topple_counts(cells_to_topple)
+                self.topple_cells(cells_to_topple, increment_time, times)
+                num_of_topples += int(np.sum(times))
+            else:
+                if vectorized:
+                    self.topple_cells(cells_to_topple, increment_time)
+                else:
+                    for cell in cells_to_topple.tolist():
+                        self.topple(divmod(cell, self.width), increment_time)
+                num_of_topples += len(cells_to_topple)
+
+            if first_row is None:
+                first_row, first_col = divmod(int(cells_to_topple[0]),
+                                              self.width)
+
+            # Calculate 'area' = number of unique toppled cells, and distance
+            # from the first toppled cell, from the cells not yet visited.
+            # The few cells of a small sweep are checked one at a time.
+            if len(cells_to_topple) <= self.scalar_cells:
+                new = [cell for cell in cells_to_topple.tolist()
+                       if not visited[cell]]
+                for cell in new:
+                    row, col = divmod(cell, self.width)
+                    max_distance = max(max_distance, abs(row - first_row)
+                                                     + abs(col - first_col))
+            else:
+                new = cells_to_topple[~visited[cells_to_topple]]
+                if len(new):
+                    rows, cols = np.divmod(new, self.width)
+                    distance = abs(rows - first_row) + abs(cols - first_col)
+                    max_distance = max(max_distance, int(np.max(distance)))
+
+            if len(new):
+                visited[new] = True
+                new_cells.append(new)
+                area += len(new)
+
+            if frontier:
+                cells_to_topple = self.unstable_cells(
+                                    self.frontier(cells_to_topple))
+            else:
+                cells_to_topple = self.unstable_cells()
 
             if not increment_time:
                 self.increment_time()
 
-        # Record observables into the avalanche_stats attributes
-        unique_toppled_cells = np.unique(toppled_cells, axis=0)
-
-        # Calculate 'area' = number of unique toppled cells.
-        area = len(unique_toppled_cells)
+        # Reset the visited mask for the next avalanche, which starts from a
+        # stable grid.
+        for new in new_cells:
+            visited[new] = False
 
-        # Calculate distance.
-        difference_i = unique_toppled_cells.T[0] - first_toppled_cell[0]
-        difference_j = unique_toppled_cells.T[1] - first_toppled_cell[1]
-        distance = abs(difference_i) + abs(difference_j)
-        max_distance = max(distance)
+        self.candidates = np.empty(0, dtype=int)
 
         # Record all stats into avalanche_stats.
         self.aval_duration.append(self.time - start_time)
@@ -241,6 +1083,52 @@ class SandPile:
         self.lost_mass.append(start_mass - self.mass())
         self.distance.append(max_distance)
 
+        if self.histograms:
+            self.update_histograms({
+                "Duration": self.time - start_time,
+                "Topples": num_of_topples,
+                "Area": area,
+                "Lost mass": start_mass - self.mass(),
+                "Distance": max_distance
+                })
+
+    def track_histograms(self, bins_per_decade=10):
+        """Keep log-binned histograms (see histogram.LogHistogram) of the
+        duration, topples, area, lost mass and distance of every avalanche
+        from now on. The histograms are saved with the avalanche stats and
+        can be merged across runs, so the distributions of the observables
+        can be estimated without the raw avalanche stats.
+
+        Parameters
+        ==========
+
+        bins_per_decade: int, optional
+
+            Number of bins in each decade. Defaults to 10.
+
+        """
+
+        self.histograms = {
+            name: histogram.LogHistogram(bins_per_decade)
+            for name in ("Duration", "Topples", "Area", "Lost mass",
+                         "Distance")
+            }
+
+    def update_histograms(self, aval_stats):
+        """Record the stats of avalanches in the tracked histograms.
+
+        Parameters
+        ==========
+
+        aval_stats: dict
+
+            The value, or array of values, of each avalanche stat by name.
+
+        """
+
+        for name, values in aval_stats.items():
+            self.histograms[name].update(values)
+
     def view_avalanche_stats(self, aval_index):
         """View the stats of any avalanche or all avalanches.
 
@@ -257,11 +1145,11 @@ class SandPile:
         aval_stats = {}
 
         if aval_index == "all":
-            aval_stats["Duration"] = self.aval_duration
-            aval_stats["Topples"] = self.topples
-            aval_stats["Area"] = self.area
-            aval_stats["Lost mass"] = self.lost_mass
-            aval_stats["Distance"] = self.distance
+            aval_stats["Duration"] = self.aval_duration.view()
+            aval_stats["Topples"] = self.topples.view()
+            aval_stats["Area"] = self.area.view()
+            aval_stats["Lost mass"] = self.lost_mass.view()
+            aval_stats["Distance"] = self.distance.view()
         else:
             aval_stats["Duration"] = self.aval_duration[aval_index]
             aval_stats["Topples"] = self.topples[aval_index]
@@ -273,7 +1161,8 @@ class SandPile:
 
     def save_avalanche_stats(self, fname):
         """Creates a dictionary object with all avalanche state and saves it
-        all as a pickle file.
+        all to a directory in the columnar format (see columnar.py), or as a
+        pickle file if `fname` ends with ".pik".
         This can be used as creating a file for the Observables class.
 
         Parameters
@@ -281,7 +1170,7 @@ class SandPile:
 
         fname: string
 
-            Name of output file.
+            Name of output directory, or of output pickle file.
 
         """
 
@@ -289,73 +1178,279 @@ class SandPile:
         aval_stats["Dimensions"] = (self.length, self.width)
         aval_stats["Threshold"] = self.threshold
         aval_stats["Time Elapsed"] = self.time
-        aval_stats["Mass History"] = self.mass_history
+        aval_stats["Mass History"] = self.mass_history.view()
         aval_stats["Grid"] = self.grid
 
-        pickle.dump(aval_stats, open(fname, "wb"))
+        if self.histograms:
+            aval_stats["Histograms"] = {name: hist.to_dict() for name, hist
+                                        in self.histograms.items()}
+
+        if fname.endswith(".pik"):
+            pickle.dump(aval_stats, open(fname, "wb"))
+        else:
+            columnar.save_columns(fname, aval_stats)
 
         return aval_stats
 
 
-class SandPileEXT1(SandPile):
-    """ THE EXTENDED SANDPILE MODEL (NO. 1):
-    This program establishes the set of functions to form an extended form of
-    the sandpile model with a set of subroutines for the NxN sandpile grid.
-    In this extended version, the toppling procedure is more advanced to make
-    sandpile topples and avalanches more realistic from the basic version.
+    def stream_avalanche_stats(self, directory, block_size=65536):
+        """Streams the mass history and avalanche stats recorded from now on
+        to a directory, instead of keeping them in memory. Each record is
+        written to its own raw binary file in blocks of `block_size` numbers
+        by a background thread, so the memory used does not grow with the
+        number of avalanches. Call `close_stream` at the end of the run to
+        save the rest of the stats to the directory, which can then be loaded
+        by the Observables class.
+        While streaming, the records can only be appended to.
 
-    Details:
-    - Toppling occurs when there is at least one cell with at least 8 grains.
-    - Toppling consists of distributing 8 grains from one cell to each of its
-    8 surrounding neighbours (or the grain falls outside of the grid).
+        Parameters
+        ==========
 
-    """
+        directory: string
 
-    def __init__(self, length, width, threshold=8):
-        """Initialize a sandpile with the specified length and width."""
-        super().__init__(length, width, threshold=threshold)
+            Name of output directory.
+
+        block_size: int, optional
+
+            The number of entries of each record written at a time.
+            Defaults to 65536.
 
-    def check_threshold(self):
-        """Returns the cells to topple because they contain a number of grains
-        that is at or over the threshold set from the initialisation of the
-        class.
         """
 
-        return list(zip(*np.where(self.grid >= self.threshold)))
+        if self.stream is not None:
+            self.close_stream()
+
+        os.makedirs(directory, exist_ok=True)
+
+        for record, name in self.records.items():
+            fname = os.path.join(directory, columnar.column_fname(name))
+            fname = fname.replace(".npy", ".bin")
+            setattr(self, record, columnar.ColumnWriter(
+                                    fname, getattr(self, record).array.dtype,
+                                    block_size))
+
+        self.stream = directory
+
+    def close_stream(self):
+        """Writes the rest of the streamed records to disk and saves the
+        dimensions, threshold, time elapsed and grid with them, in the same
+        format as `save_avalanche_stats`. Records are kept in memory again
+        from then on, starting empty. Returns the name of the directory.
+        """
+
+        stats = {name: getattr(self, record)
+                 for record, name in self.records.items()}
+        stats["Dimensions"] = (self.length, self.width)
+        stats["Threshold"] = self.threshold
+        stats["Time Elapsed"] = self.time
+        stats["Grid"] = self.grid
+
+        if self.histograms:
+            stats["Histograms"] = {name: hist.to_dict() for name, hist
+                                   in self.histograms.items()}
+
+        columnar.save_columns(self.stream, stats)
+
+        for record in self.records:
+            setattr(self, record, GrowableArray(getattr(self, record).dtype))
+
+        directory = self.stream
+        self.stream = None
+
+        return directory
+
+    def save_checkpoint(self, directory):
+        """Saves a checkpoint of the sandpile to a directory, from which the
+        run can be resumed with `resume`.
+        Each record is stored in its own binary file, and only the entries
+        recorded since the last checkpoint are appended to it, so the cost of
+        a checkpoint does not grow with the length of the run. The grid, time,
+        random number generator state, histograms and the length of each
+        record are then pickled to a temporary file that atomically replaces
+        the state file, so a crash during a checkpoint leaves the previous one
+        intact.
 
-    def topple(self, cell, increment_time=False):
-        """Topple the specified cell.
         Parameters
         ==========
 
-        cell: tuple-like
+        directory: string
 
-            The address of the cell to topple.
+            Name of checkpoint directory.
+
+        """
+
+        if self.stream is not None:
+            raise ValueError("The records of a sandpile that are streamed to "
+                             "disk cannot be checkpointed.")
+
+        os.makedirs(directory, exist_ok=True)
+        state_fname = os.path.join(directory, "state.pik")
+
+        if self.checkpoint_sizes is None:
+            # Start a new checkpoint, discarding any older one.
+            if os.path.exists(state_fname):
+                os.remove(state_fname)
+            self.checkpoint_sizes = {record: 0 for record in self.records}
+            mode = "wb"
+        else:
+            mode = "ab"
+
+        sizes = {}
+        for record in self.records:
+            values = getattr(self, record).view()
+            with open(os.path.join(directory, f"{record}.bin"), mode) as f:
+                values[self.checkpoint_sizes[record]:].tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            sizes[record] = len(values)
+
+        state = {
+            "Dimensions": (self.length, self.width),
+            "Threshold": self.threshold,
+            "Debug": self.debug,
+            "Grid": self.grid,
+            "Mass": self._mass,
+            "Time": self.time,
+            "Avalanches": self.num_of_avalanches,
+            "Random State": np.random.get_state(),
+            "Histograms": {name: hist.to_dict() for name, hist
+                           in self.histograms.items()},
+            "Sizes": sizes,
+            "Dtypes": {record: getattr(self, record).array.dtype.str
+                       for record in self.records}
+            }
+
+        tmp_fname = state_fname + ".tmp"
+        with open(tmp_fname, "wb") as f:
+            pickle.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fname, state_fname)
+
+        self.checkpoint_sizes = sizes
+
+    @classmethod
+    def resume(cls, directory):
+        """Returns the sandpile saved at the last checkpoint in a directory,
+        and restores the state of the random number generator, so that the
+        run continues exactly as it would have without stopping.
+        Entries appended to the record files after the last checkpoint (by a
+        checkpoint that did not finish) are truncated.
+
+        Parameters
+        ==========
+
+        directory: string
+
+            Name of checkpoint directory.
+
+        """
+
+        with open(os.path.join(directory, "state.pik"), "rb") as f:
+            state = pickle.load(f)
+
+        length, width = state["Dimensions"]
+        sp = cls(length, width, state["Threshold"], state["Debug"])
+
+        sp.grid = state["Grid"]
+        sp._mass = state["Mass"]
+        sp.time = state["Time"]
+        sp.num_of_avalanches = state["Avalanches"]
+
+        for record in sp.records:
+            fname = os.path.join(directory, f"{record}.bin")
+            dtype = np.dtype(state["Dtypes"][record])
+            size = state["Sizes"][record]
+
+            with open(fname, "r+b") as f:
+                f.truncate(size * dtype.itemsize)
+            values = np.fromfile(fname, dtype=dtype)
+
+            growable = GrowableArray(dtype, max(size, 16))
+            growable.extend(values)
+            setattr(sp, record, growable)
+
+        sp.histograms = {name: histogram.LogHistogram.from_dict(hist)
+                         for name, hist in state["Histograms"].items()}
+
+        sp.checkpoint_sizes = state["Sizes"]
+        np.random.set_state(state["Random State"])
+
+        return sp
+
+    def run_avalanches(self, num_aval_request, n=1, cell=None,
+                       increment_time=False, checkpoint=None, interval=1000,
+                       **kwargs):
+        """Drop grains of sand and run avalanches until the sandpile has
+        recorded `num_aval_request` avalanches in total, optionally saving a
+        checkpoint every `interval` avalanches and at the end.
+        A sandpile returned by `resume` continues the same run when this is
+        called again with the same arguments.
+
+        Parameters
+        ==========
+
+        num_aval_request: int
+
+            The total number of avalanches to record.
+
+        n: int or iter
+
+            The number of grains of sand of each drop, as in `drop_sand`.
+            Defaults to 1.
+
+        cell: list
+
+            The cells on which grains of sand may be dropped, as in
+            `drop_sand`. Defaults to None.
 
         increment_time: bool
 
-            Whether to increment one time step or not. Defaults to False.
+            As in `avalanche`. Defaults to False.
+
+        checkpoint: string, optional
+
+            Name of checkpoint directory. If None, no checkpoints are saved.
+            Defaults to None.
+
+        interval: int, optional
+
+            The number of avalanches between checkpoints. Defaults to 1000.
+
+        Other keyword arguments are passed to `avalanche`.
 
         """
 
-        neighbours = lambda x, y : [(xx, yy) for xx in range(x-1, x+2)
-                                       for yy in range(y-1, y+2)
-                                       if (-1 < x < self.width and
-                                           -1 < y < self.length and
-                                           (x != xx or y != yy))]
+        while self.num_of_avalanches < num_aval_request:
+            self.drop_until_unstable(n, cell)
+            self.avalanche(increment_time, **kwargs)
 
-        i, j = cell
+            if checkpoint and self.num_of_avalanches % interval == 0:
+                self.save_checkpoint(checkpoint)
+
+        if checkpoint:
+            self.save_checkpoint(checkpoint)
 
-        self.grid[i][j] -= 8
 
-        for ncell in neighbours(i, j):
-            ii, jj = ncell
+class SandPileEXT1(SandPile):
+    """ THE EXTENDED SANDPILE MODEL (NO. 1):
+    This program establishes the set of functions to form an extended form of
+    the sandpile model with a set of subroutines for the NxN sandpile grid.
+    In this extended version, the toppling procedure is more advanced to make
+    sandpile topples and avalanches more realistic from the basic version.
 
-            if (0 <= ii < self.length) and (0 <= jj < self.width):
-                self.grid[ii][jj] += 1
+    Details:
+    - Toppling occurs when there is at least one cell with at least 8 grains.
+    - Toppling consists of distributing 8 grains from one cell to each of its
+    8 surrounding neighbours (or the grain falls outside of the grid).
 
-        if increment_time:
-            self.increment_time()
+    """
+
+    rule = ToppleRule("height", EIGHT_NEIGHBOURS)
+
+    def __init__(self, length, width, threshold=8, debug=False):
+        """Initialize a sandpile with the specified length and width."""
+        super().__init__(length, width, threshold=threshold, debug=debug)
 
 
 class SandPileEXT2(SandPile):
@@ -375,28 +1470,11 @@ class SandPileEXT2(SandPile):
 
     """
 
-    def __init__(self, length, width, threshold=8):
-        """Initialize a sandpile with the specified length and width."""
-        super().__init__(length, width, threshold=threshold)
-
-    def check_threshold(self):
-        """Returns the cells to topple by detecting the cells with neighbours
-        that satisfy the condition that the difference in grains is at least
-        the threshold set from the initialisation of the class.
-        """
-
-        neighbours = self.neighbours()
-
-        cells_to_topple = []
-        for cell in neighbours:
-            ncells = neighbours[cell]
+    rule = ToppleRule("difference", EIGHT_NEIGHBOURS)
 
-            differences = np.array(list(zip(*ncells))[1])
-
-            if np.any(differences >= self.threshold):
-                cells_to_topple.append(cell)
-
-        return cells_to_topple
+    def __init__(self, length, width, threshold=8, debug=False):
+        """Initialize a sandpile with the specified length and width."""
+        super().__init__(length, width, threshold=threshold, debug=debug)
 
     def neighbours(self):
         """Returns the difference in grains between every cell and its
@@ -407,8 +1485,8 @@ class SandPileEXT2(SandPile):
 
         neighbours = lambda x, y : [(xx, yy) for xx in range(x-1, x+2)
                                        for yy in range(y-1, y+2)
-                                       if (-1 < x < self.width and
-                                           -1 < y < self.length and
+                                       if (-1 < x < self.length and
+                                           -1 < y < self.width and
                                            (x != xx or y != yy))]
 
         for cell in product(*(range(n) for n in (self.length, self.width))):
@@ -428,33 +1506,3 @@ class SandPileEXT2(SandPile):
             neighbours_dict[cell] = neighbour_vals
 
         return neighbours_dict
-
-    def topple(self, cell, increment_time=False):
-        """Topple the specified cell.
-        Parameters
-        ==========
-
-        cell: tuple-like
-
-            The address of the cell to topple.
-
-        increment_time: bool
-
-            Whether to increment one time step or not. Defaults to False.
-
-        """
-
-        i, j = cell
-
-        for ncell in self.neighbours()[cell]:
-            ii, jj = ncell[0]
-            difference = ncell[1]
-
-            if difference >= self.threshold:
-                self.grid[i][j] -= 1
-
-                if (0 <= ii < self.length) and (0 <= jj < self.width):
-                    self.grid[ii][jj] += 1
-
-        if increment_time:
-            self.increment_time()
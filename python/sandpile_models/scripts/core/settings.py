@@ -0,0 +1,59 @@
+""" A script that contains the settings of where and how many grains of sand
+are dropped on the sandpile in the experiments of the sandpile models.
+"""
+
+
+""" IMPORTS """
+
+from collections import namedtuple
+from itertools import product
+
+
+""" FUNCTIONS """
+
+Settings = namedtuple('Settings',
+                        [
+                        'directory',
+                        'cell',
+                        'n'
+                        ]
+                        )
+
+def drop_settings(length, width):
+    """ Returns a dictionary of every drop setting by name for a sandpile with
+    the specified length and width.
+
+    Parameters
+    ==========
+
+    length, width: int
+
+        Dimensions of the sandpile grid.
+
+    """
+
+    # BASIC setting.
+    basic = Settings("basic/", None, 1)
+
+    # CENTRE_OF_GRID setting.
+    i = int(((length + 1) / 2) - 1)
+    j = int(((width + 1) / 2) - 1)
+    centre_of_grid = Settings("centre_of_grid/", [(i, j)], 1)
+
+    # TOP LEFT QUARTER
+    tlq_cells = list(product(range(i), range(j)))
+    top_left_qtr = Settings("top_left_qtr/", tlq_cells, 1)
+
+    # DROP 4 GRAINS
+    four_grains = Settings("four_grains/", None, 4)
+
+    # DROP RANDOM AMOUNT OF GRAINS
+    random_grains = Settings("random_grains/", None, range(6))
+
+    return {
+        "basic": basic,
+        "centre_of_grid": centre_of_grid,
+        "top_left_qtr": top_left_qtr,
+        "four_grains": four_grains,
+        "random_grains": random_grains
+        }
@@ -1,31 +1,86 @@
 """ This program tests the sandpile grid for scale invariance.
 Scale invariance means that the structure of the observables and grid is
 (roughly) unchanged to changes in the dimensions of the grid.
+
+The sandpiles of all dimensions are simulated at the same time in a pool of
+processes. A power law is fitted to an observable for each dimension, and a
+finite-size-scaling data collapse estimates the cutoff-scaling exponent, D,
+of the observable from all dimensions.
+
+Run in terminal as follows:
+python scale_invariance.py [num_aval_request] [processes]
 """
 
 """ IMPORTS """
-from time import sleep
+from time import sleep, perf_counter
 import numpy as np
 import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 
-sys.path.append("./core")
+sys.path.append("./../core")
 import sandpile
+import observables
 
-from importlib import reload
-reload(sandpile)
 
-import main as main_script
+""" INPUTS """
+dimensions = [8, 16, 32, 64, 128, 256]
 
+sandpile_class = "SandPile"
+observable = "topples"
+seed = 0
 
-""" INPUTS """
-dimensions = [2, 5, 10, 20]
+num_aval_request = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
 
 # Directory to save output plots.
-dir = "./../output/scale_invariance/"
+dir = "./../../output/scale_invariance/"
 
 
 """ FUNCTIONS """
+def run_dimension(lw):
+    """ Brings a sandpile with dimensions lw, lw to its critical state, runs
+    the avalanches on it and saves its avalanche stats. Returns the file name
+    of the stats and the wall time.
+
+    The sandpile is critical once its density (average mass) has stopped
+    growing: grains are dropped in batches of lw * lw / 4 and relaxed until a
+    batch no longer increases the mass. For an Abelian rule, relaxing a batch
+    at once leaves the same grid as dropping its grains one at a time.
+
+    Parameters
+    ==========
+
+    lw: int
+
+        Length and width of the sandpile.
+
+    """
+
+    seed_sequence = np.random.SeedSequence([seed, lw])
+    random_state = np.random.RandomState(np.random.MT19937(seed_sequence))
+    np.random.set_state(random_state.get_state())
+
+    start = perf_counter()
+
+    sp = getattr(sandpile, sandpile_class)(lw, lw)
+    sp.burn_in(sp.threshold // 2 * lw * lw)
+
+    mass = -1
+    while sp.mass() > mass:
+        mass = sp.mass()
+        sp.burn_in(max(lw * lw // 4, 1))
+
+    for _ in range(num_aval_request):
+        sp.drop_until_unstable()
+        sp.avalanche()
+
+    fname = f"{dir}stats_{sandpile_class}_{lw}_{num_aval_request}"
+    sp.save_avalanche_stats(fname)
+
+    return fname, perf_counter() - start
+
 def main():
 
     print("\n"+"="*30)
@@ -33,29 +88,48 @@ def main():
     print("="*30+"\n\n")
     sleep(1)
 
-    # Create a histogram of an observable for different grid dimensions.
-    print("Performing scale invariances for dimensions 2, 5, 10, 50, 100.")
+    os.makedirs(dir, exist_ok=True)
+
+    # Simulate the sandpiles of all dimensions at the same time, starting
+    # with the largest since it takes the longest.
+    print(f"Executing {num_aval_request} avalanches on sandpiles with "
+          f"dimensions {', '.join(str(lw) for lw in dimensions)}.")
     print("\n"+"-"*30+"\n")
-    for lw in dimensions:
-        sp = sandpile.SandPile(lw, lw)
 
-        print(f"Executing 5000 avalanches on sandpile with dimensions {lw}, {lw}")
-        for i in range(5000):
-            main_script.execute_avalanches(sp, i)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = dict(zip(sorted(dimensions, reverse=True),
+                           pool.map(run_dimension,
+                                    sorted(dimensions, reverse=True))))
+
+    # Create a powerlaw fit of the observable for each grid dimension.
+    obs = []
+    for lw in dimensions:
+        fname, wall_time = results[lw]
+        print(f"Dimensions {lw}, {lw} done in {wall_time:.2f} s.")
 
-        fname = f"{dir}stats.pik"
-        sp.save_avalanche_stats(fname)
-        ob = sandpile.Observables(fname)
+        ob = observables.Observables(fname)
+        obs.append(ob)
 
-        print(f"\n\nDone! Saving powerlaw fit plot to {fname}")
-        ob.powerlaw_fit(ob.topples, plot=1, xscale="log", yscale="log")
-        plt.xlabel("Topples")
-        plt.ylabel("Probability")
+        a, b, r = ob.powerlaw_fit(observable, plot=1,
+                                  xscale="log", yscale="log")[0]
         plt.title(f"Powerlaw Fit, Dimensions: {lw}")
         plt.savefig(f"{dir}powerlaw_fit{lw}.png")
+        plt.close()
+
+        print(f"Powerlaw fit: b = {b:.3f}, r = {r:.4f}\n")
+
+    # Estimate the exponents from all dimensions.
+    fss = observables.finite_size_scaling(obs, dimensions, observable)
+
+    print("-"*30+"\n")
+    print(f"Finite-size scaling: D = {fss.D:.3f}, tau = {fss.tau:.3f}, "
+          f"r = {fss.r:.4f}")
 
-        print("\nPlot saved! Moving on to the next sandpile...")
+    observables.data_collapse(obs, dimensions, observable, fss.D, fss.tau)
+    plt.savefig(f"{dir}data_collapse.png")
+    plt.close()
 
+    print(f"\nData collapse plot saved to {dir}data_collapse.png")
     print("\n"+"-"*30+"\n")
     print("Program finished!")
 
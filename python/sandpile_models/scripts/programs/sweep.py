@@ -0,0 +1,239 @@
+""" Sweep program: Simulates a grid of experiments (sandpile class, setting,
+dimensions, number of avalanches and seed) in parallel across a pool of
+processes and saves the statistics of each experiment to observables.
+
+Each experiment is saved to the same directory as tests.py would save it to,
+and a summary of the wall time and throughput of every experiment is saved to
+the tests output directory. Each experiment also saves checkpoints to its
+directory, and running the same sweep again (with the same seed) resumes any
+unfinished experiment from its last checkpoint.
+
+Run in terminal as follows:
+python sweep.py length width num_aval_request [seed] [processes]
+"""
+
+""" IMPORTS """
+import numpy as np
+import sys
+import os
+from time import perf_counter
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+sys.path.append("./../core")
+import sandpile
+import settings
+
+
+""" INPUTS """
+
+# Directory of the output of all experiments.
+OUTPUT = "./../../output/tests/"
+
+# Number of avalanches between checkpoints of each experiment.
+checkpoint_interval = 1000
+
+sandpile_classes = ("SandPile", "SandPileEXT1", "SandPileEXT2")
+setting_names = ("basic", "centre_of_grid", "top_left_qtr", "four_grains",
+                 "random_grains")
+
+
+""" FUNCTIONS """
+
+Job = namedtuple('Job',
+                    [
+                    'sandpile_class',
+                    'setting',
+                    'length',
+                    'width',
+                    'num_aval_request',
+                    'seed'
+                    ]
+                    )
+
+Summary = namedtuple('Summary',
+                        [
+                        'job',
+                        'fname',
+                        'wall_time',
+                        'avalanches_per_second',
+                        'topples_per_second'
+                        ]
+                        )
+
+def make_jobs(classes, setting_names, dimensions, num_aval_requests, seed=0):
+    """ Returns the jobs of every combination of sandpile class, setting,
+    dimensions and number of avalanches. Each job is given its own seed,
+    counting up from `seed`.
+
+    Parameters
+    ==========
+
+    classes: iter
+
+        Names of the sandpile classes.
+
+    setting_names: iter
+
+        Names of the drop settings (see settings.drop_settings).
+
+    dimensions: iter
+
+        (length, width) of the sandpile grids.
+
+    num_aval_requests: iter
+
+        Numbers of avalanches to run.
+
+    seed: int, optional
+
+        Seed of the first job. Defaults to 0.
+
+    """
+
+    combinations = product(classes, setting_names, dimensions,
+                           num_aval_requests)
+
+    return [Job(sandpile_class, setting, length, width, num_aval_request,
+                seed + index)
+            for index, (sandpile_class, setting, (length, width),
+                        num_aval_request) in enumerate(combinations)]
+
+def job_directory(job):
+    """ Returns the output directory of a job, in the same layout as tests.py.
+    """
+
+    setting = settings.drop_settings(job.length, job.width)[job.setting]
+
+    return (f"{OUTPUT}{setting.directory}{job.sandpile_class}/"
+            f"{job.length}_{job.width}_{job.num_aval_request}/")
+
+def run_job(job):
+    """ Runs the avalanches of one job in the same way as tests.py, saves its
+    avalanche stats and returns a summary of its wall time and throughput.
+
+    The global random number generator is seeded from a SeedSequence of the
+    job seed, so jobs with different seeds draw from independent streams.
+    If the job has a checkpoint, it is resumed from the checkpoint instead.
+    Checkpoints are kept in a directory for each seed, so a job is never
+    resumed from the run of another seed.
+    """
+
+    setting = settings.drop_settings(job.length, job.width)[job.setting]
+    sandpile_class = getattr(sandpile, job.sandpile_class)
+    directory = job_directory(job)
+    checkpoint = f"{directory}checkpoint_{job.seed}/"
+
+    if os.path.exists(f"{checkpoint}state.pik"):
+        sp = sandpile_class.resume(checkpoint)
+    else:
+        seed_sequence = np.random.SeedSequence(job.seed)
+        random_state = np.random.RandomState(np.random.MT19937(seed_sequence))
+        np.random.set_state(random_state.get_state())
+
+        sp = sandpile_class(job.length, job.width)
+
+    start = perf_counter()
+    start_avalanches = sp.num_of_avalanches
+    sp.run_avalanches(job.num_aval_request, n=setting.n, cell=setting.cell,
+                      increment_time=True, checkpoint=checkpoint,
+                      interval=checkpoint_interval)
+    wall_time = perf_counter() - start
+    num_avalanches = sp.num_of_avalanches - start_avalanches
+
+    fname = f"{directory}aval_stats"
+    sp.save_avalanche_stats(fname)
+
+    return Summary(job, fname, wall_time,
+                   num_avalanches / wall_time,
+                   np.sum(sp.topples[start_avalanches:]) / wall_time)
+
+def run_sweep(jobs, processes=None):
+    """ Runs the jobs in a pool of processes and returns their summaries in
+    the order of the jobs.
+
+    Parameters
+    ==========
+
+    jobs: list
+
+        Jobs to run, for example from `make_jobs`.
+
+    processes: int, optional
+
+        Number of processes in the pool. If None, one per CPU.
+        Defaults to None.
+
+    """
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(run_job, jobs))
+
+def save_summary(summaries, fname):
+    """ Prints the summary of every job and saves it as a csv file.
+
+    Parameters
+    ==========
+
+    summaries: list
+
+        Summaries returned by `run_sweep`.
+
+    fname: string
+
+        Name of output file.
+
+    """
+
+    header = Job._fields + Summary._fields[1:]
+
+    rows = [(*summary.job, summary.fname, f"{summary.wall_time:.3f}",
+             f"{summary.avalanches_per_second:.1f}",
+             f"{summary.topples_per_second:.1f}")
+            for summary in summaries]
+
+    with open(fname, "w") as f:
+        for row in [header] + rows:
+            f.write(",".join(str(x) for x in row) + "\n")
+
+    for summary in summaries:
+        job = summary.job
+        print(f"{job.sandpile_class:>12} {job.setting:>14} "
+              f"{job.length}x{job.width} {job.num_aval_request:>8} avalanches"
+              f" | {summary.wall_time:8.2f} s"
+              f" | {summary.avalanches_per_second:10.1f} avalanches/s"
+              f" | {summary.topples_per_second:12.1f} topples/s")
+
+
+def main():
+
+    length = int(sys.argv[1])
+    width = int(sys.argv[2])
+    num_aval_request = int(sys.argv[3])
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    processes = int(sys.argv[5]) if len(sys.argv) > 5 else None
+
+    jobs = make_jobs(sandpile_classes, setting_names, [(length, width)],
+                     [num_aval_request], seed)
+
+    print("\n"+"="*30)
+    print("SWEEP.PY: RUNNING ALL SETTINGS AND SANDPILE CLASSES")
+    print("="*30+"\n")
+    print(f"Running {len(jobs)} jobs of {num_aval_request} avalanches on "
+          f"{length} x {width} grids...\n")
+
+    start = perf_counter()
+    summaries = run_sweep(jobs, processes)
+    print(f"Done in {perf_counter() - start:.2f} s!\n")
+
+    os.makedirs(OUTPUT, exist_ok=True)
+    fname = f"{OUTPUT}sweep_summary_{length}_{width}_{num_aval_request}.csv"
+    save_summary(summaries, fname)
+
+    print(f"\nSummary saved to {fname}")
+    print("="*30)
+
+""" EXECUTION """
+if __name__ == "__main__":
+    main()
@@ -12,48 +12,21 @@ import os
 from time import sleep
 import matplotlib.pyplot as plt
 import pickle
-from collections import namedtuple
-from itertools import product
 
 sys.path.append("./../core")
 import sandpile
 import observables
+import settings
 
 
 """ INPUTS """
 
-Settings = namedtuple('Settings',
-                        [
-                        'directory',
-                        'cell',
-                        'n'
-                        ]
-                        )
-
 length = int(sys.argv[1])
 width = int(sys.argv[2])
 num_aval_request = int(sys.argv[3])
 
-# BASIC setting.
-basic = Settings("basic/", None, 1)
-
-# CENTRE_OF_GRID setting.
-i = int(((length + 1) / 2) - 1)
-j = int(((width + 1) / 2) - 1)
-centre_of_grid = Settings("centre_of_grid/", [(i, j)], 1)
-
-# TOP LEFT QUARTER
-tlq_cells = list(product(range(i), range(j)))
-top_left_qtr = Settings("top_left_qtr/", tlq_cells, 1)
-
-# DROP 4 GRAINS
-four_grains = Settings("four_grains/", None, 4)
-
-# DROP RANDOM AMOUNT OF GRAINS
-random_grains = Settings("random_grains/", None, range(6))
-
 # SETTING APPLIED HERE
-setting = vars()[sys.argv[4]]
+setting = settings.drop_settings(length, width)[sys.argv[4]]
 
 
 """ SETUP """
@@ -95,13 +68,8 @@ def progress_bar(func):
 # Execute an avalanche at time of request.
 @progress_bar
 def execute_avalanches(sp, index, n=1, cell=None, increment_time=False):
-    no_avalanche = True
-    while no_avalanche:
-        if sp.check_threshold():
-            sp.avalanche(increment_time)
-            no_avalanche = False
-        else:
-            sp.drop_sand(n=n, cell=cell)
+    sp.drop_until_unstable(n=n, cell=cell)
+    sp.avalanche(increment_time)
 
 # Print stats for any avalanche.
 def print_avalanche_stats(sp, index):
@@ -119,30 +87,21 @@ def powerlaw_plots(ob, dir):
 
     for observable in names:
 
-        ob.powerlaw_fit(observable, False, 1, "log", "log")
-        plt.show()
-
-        data = getattr(ob, observable)
-        x, y = np.unique(data, return_counts=1)
-        print(np.log10(x), np.log(y))
-        cut = input("Where should the data be split (cut)?  ")
-
-        plt.close()
-        cut_valid = True
-        while cut_valid:
-            if cut == "end":
-                exit()
-            try:
-                cut = float(cut)
-                ob.powerlaw_fit(observable, cut, 1, "log", "log")
-            except:
-                cut = input("Invalid number. Try again: ")
-            else:
-                cut_valid = False
+        try:
+            fit, intervals = ob.powerlaw_mle(observable, num_bootstrap=100,
+                                             plot=1, seed=0)
+        except ValueError as error:
+            print(f"WARNING: {observable} powerlaw fit could not be "
+                  f"produced. {error}")
+            continue
 
         plt.savefig(f"{dir}{observable}_powerlawfit.png")
         plt.close()
 
+        low, high = intervals.alpha_interval
+        print(f"{observable}: alpha = {fit.alpha:.3f} [{low:.3f}, {high:.3f}]"
+              f", xmin = {fit.xmin}, tail of {fit.n_tail} avalanches")
+
 # Save plots of histograms, line plots and heatmap of grid.
 def save_plots(ob, dir):
 
@@ -200,9 +159,9 @@ def main():
 
     # Save sandpile stats to enable initialization of instance of
     # observables class.
-    fname = f"{DIRECTORY}aval_stats.pik"
+    fname = f"{DIRECTORY}aval_stats"
     sp.save_avalanche_stats(fname)
-    print(f"aval_stats dictionary dumped to {fname}!\n")
+    print(f"aval_stats saved to {fname}!\n")
 
     # Initialize observables class with sandpile stats above and save plots.
     ob = observables.Observables(fname)
@@ -218,7 +177,7 @@ def main():
     sleep(2)
 
 def powerlaw():
-    fname = f"{DIRECTORY}aval_stats.pik"
+    fname = f"{DIRECTORY}aval_stats"
     ob = observables.Observables(fname)
     powerlaw_plots(ob, DIRECTORY)
 
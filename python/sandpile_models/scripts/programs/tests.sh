@@ -1,28 +1,15 @@
 ### EXECUTE THIS SCRIPT FOR ALL OUTPUT
 
-### Dimensions will be: 3, 7, 10
+### Runs every setting (basic, centre_of_grid, top_left_qtr, four_grains,
+### random_grains) for every sandpile class (SandPile, SandPileEXT1,
+### SandPileEXT2) in parallel, one process per CPU.
+
+### Dimensions will be: 10 x 10
 ### Number of avalanches run will be: 10000
 
 length=10
 width=10
 num=10000
+seed=0
 
-python tests.py $length $width $num basic SandPile
-python tests.py $length $width $num basic SandPileEXT1
-python tests.py $length $width $num basic SandPileEXT2
-
-python tests.py $length $width $num centre_of_grid SandPile
-python tests.py $length $width $num centre_of_grid SandPileEXT1
-python tests.py $length $width $num centre_of_grid SandPileEXT2
-
-python tests.py $length $width $num top_left_qtr SandPile
-python tests.py $length $width $num top_left_qtr SandPileEXT1
-python tests.py $length $width $num top_left_qtr SandPileEXT2
-
-python tests.py $length $width $num four_grains SandPile
-python tests.py $length $width $num four_grains SandPileEXT1
-python tests.py $length $width $num four_grains SandPileEXT2
-
-python tests.py $length $width $num random_grains SandPile
-python tests.py $length $width $num random_grains SandPileEXT1
-python tests.py $length $width $num random_grains SandPileEXT2
+python sweep.py $length $width $num $seed
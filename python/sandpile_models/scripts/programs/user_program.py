@@ -15,13 +15,8 @@ import sandpile
 # otherwise continue to drop grains at random grid locations.
 
 def execute_avalanche():
-    no_avalanche = True
-    while no_avalanche:
-        if my_sandpile.check_threshold():
-            my_sandpile.avalanche()
-            no_avalanche = False
-        else:
-            my_sandpile.drop_sand()
+    my_sandpile.drop_until_unstable()
+    my_sandpile.avalanche()
 
 # Print stats of latest avalanche.
 def print_avalanche_stats():
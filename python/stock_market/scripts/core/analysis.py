@@ -44,8 +44,8 @@ class CrashAnalysis:
             imin = signal.argrelmin(x.values.squeeze(), order=6)[0]
             imax = signal.argrelmax(x.values.squeeze(), order=6)[0]
 
-            ax.scatter(x[imin].index, x[imin].values, color='b')
-            ax.scatter(x[imax].index, x[imax].values, color='r')
+            ax.scatter(x.iloc[imin].index, x.iloc[imin].values, color='b')
+            ax.scatter(x.iloc[imax].index, x.iloc[imax].values, color='r')
 
     def crash_detection(self, size):
         """ Detects a crash in an index fund timeseries, which is defined by a
@@ -77,9 +77,9 @@ class CrashAnalysis:
             except IndexError:
                 continue
 
-            sub_x = x[max_index : min_index + 1]
+            sub_x = x.iloc[max_index : min_index + 1]
 
-            threshold = drop_ratio * x[max_index]
+            threshold = drop_ratio * x.iloc[max_index]
             if np.any(sub_x < threshold):
                 start = sub_x.index[0]
                 end = sub_x.index[-1]
@@ -118,3 +118,226 @@ class CrashAnalysis:
         return crashStats((start, end),
                             duration,
                             percent_size * 100)
+
+CrashDistribution = namedtuple('CrashDistribution',
+                                [
+                                'replica',
+                                'start',
+                                'end',
+                                'duration',
+                                'size'
+                                ]
+                                )
+
+def timeseries(values, start_time="2020-01-01"):
+    """ Returns a series of values (such as the volume history of a
+    StockMarket) as a daily timeseries, one day per trade, which can be
+    analysed with CrashAnalysis.
+
+    Parameters
+    ==========
+
+    values: array
+
+        The values of the series.
+
+    start_time: str, optional
+
+        Date of the first value. Defaults to "2020-01-01".
+
+    """
+
+    values = np.asarray(values)
+
+    end_time = np.datetime64(start_time) + np.timedelta64(len(values))
+    time_range = np.arange(start_time, end_time, dtype='datetime64[D]')
+
+    return pd.Series(values, index=time_range)
+
+def crash_distribution(volumes, size, start_time="2020-01-01"):
+    """ Detects the crashes of each of many realizations of a series (see
+    CrashAnalysis.crash_detection) and returns a CrashDistribution of arrays
+    with the realization, start, end, duration (in days) and size (in per
+    cent) of every crash found.
+
+    Parameters
+    ==========
+
+    volumes: array
+
+        The series of each realization, with a row for each realization.
+
+    size: int, float
+
+        The minimum size of a drop from a local peak that classifies as a
+        crash.
+
+    start_time: str, optional
+
+        Date of the first value of each series. Defaults to "2020-01-01".
+
+    """
+
+    crashes = []
+    for replica, values in enumerate(volumes):
+        data = CrashAnalysis(timeseries(values, start_time))
+        data.crash_detection(size)
+
+        for i, _ in enumerate(data.crash_history):
+            stats = data.crash_stats(i)
+            crashes.append((replica, *stats.time, stats.duration,
+                            stats.lost_units))
+
+    if not crashes:
+        return CrashDistribution(np.array([], dtype=int),
+                                 np.array([], dtype='datetime64[D]'),
+                                 np.array([], dtype='datetime64[D]'),
+                                 np.array([], dtype=int),
+                                 np.array([], dtype=float))
+
+    replica, start, end, duration, lost_units = zip(*crashes)
+
+    return CrashDistribution(np.array(replica),
+                             np.array(start, dtype='datetime64[D]'),
+                             np.array(end, dtype='datetime64[D]'),
+                             np.array(duration),
+                             np.array(lost_units))
+
+CrashEvent = namedtuple('CrashEvent',
+                        [
+                        'kind',
+                        'time',
+                        'peak_time',
+                        'trough_time',
+                        'duration',
+                        'lost_units'
+                        ]
+                        )
+
+class DrawdownDetector:
+    """ An online crash detector, which finds crashes in a timeseries as its
+    values arrive, one at a time, in O(1) time and memory per value.
+
+    Details:
+    - a crash starts when the value drops by at least `size` per cent from
+    the running peak (the largest value since the last crash).
+    - a crash ends when the value rises by at least `recovery` per cent from
+    the lowest value (trough) of the crash, or above the peak.
+    - when a crash ends, the running peak restarts from the current value.
+    - a "start" and an "end" CrashEvent are returned as they happen, with the
+    times of the peak and trough, the duration from the peak to the trough
+    (in values) and the drop from the peak to the trough (in per cent), as
+    in CrashAnalysis.crash_stats.
+
+    """
+
+    def __init__(self, size, recovery=None):
+        """Initialize the detector of crashes of at least `size` per cent,
+        which end after a recovery of `recovery` per cent (defaults to
+        `size`).
+        """
+        self.size = size
+        self.recovery = size if recovery is None else recovery
+
+        self.drop_ratio = (100 - size) / 100
+        self.rise_ratio = (100 + self.recovery) / 100
+
+        self.count = 0
+        self.peak = None
+        self.trough = None
+        self.in_crash = False
+
+        self.crash_history = []
+
+    def event(self, kind, time):
+        """Returns a CrashEvent of the current crash."""
+
+        peak_value, peak_time, peak_count = self.peak
+        trough_value, trough_time, trough_count = self.trough
+
+        return CrashEvent(kind, time, peak_time, trough_time,
+                          trough_count - peak_count,
+                          100 * (peak_value - trough_value) / peak_value)
+
+    def update(self, value, time=None):
+        """ Adds the next value of the timeseries and returns a CrashEvent
+        if a crash starts or ends with it, or None otherwise.
+
+        Parameters
+        ==========
+
+        value: int, float
+
+            The next value of the timeseries.
+
+        time: optional
+
+            The time of the value, such as a date. Defaults to the number of
+            values added before it.
+
+        """
+
+        if time is None:
+            time = self.count
+        current = (value, time, self.count)
+        self.count += 1
+
+        if self.peak is None:
+            self.peak = self.trough = current
+            return None
+
+        if not self.in_crash:
+            if value > self.peak[0]:
+                self.peak = current
+            elif value <= self.drop_ratio * self.peak[0]:
+                self.trough = current
+                self.in_crash = True
+                return self.event("start", time)
+            return None
+
+        if value < self.trough[0]:
+            self.trough = current
+            return None
+
+        if value >= self.rise_ratio * self.trough[0] or value > self.peak[0]:
+            event = self.event("end", time)
+            self.crash_history.append((event.peak_time, event.trough_time))
+
+            self.peak = self.trough = current
+            self.in_crash = False
+            return event
+
+        return None
+
+    def extend(self, values, times=None):
+        """ Adds many values of the timeseries, such as a block of trades of
+        StockMarket.stream or a pandas Series (whose index gives the times),
+        and returns a list of the CrashEvents that happen.
+
+        Parameters
+        ==========
+
+        values: array, Series
+
+            The next values of the timeseries.
+
+        times: array, optional
+
+            The times of the values. Defaults to the index of a Series, or
+            else the number of values added before each.
+
+        """
+
+        if times is None and isinstance(values, pd.Series):
+            times = values.index
+        values = np.asarray(values)
+        if times is None:
+            times = [None] * len(values)
+
+        events = []
+        for value, time in zip(values, times):
+            event = self.update(value, time)
+            if event is not None:
+                events.append(event)
+
+        return events
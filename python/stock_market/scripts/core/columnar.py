@@ -0,0 +1,30 @@
+""" A script that provides the columnar on-disk format of the stats of run
+experiments to the stock market. The format, with its writer and reader, is
+owned by the sandpile models (see sandpile_models/scripts/core/columnar.py),
+and that module is loaded here by path, so both trees save and load stats
+with the same code.
+"""
+
+
+""" IMPORTS """
+
+import importlib.util
+import os
+import sys
+
+
+""" EXECUTION """
+
+# The columnar module of the sandpile models. It is loaded by path rather
+# than by adding its directory to sys.path, where its sandpile.py would
+# shadow the stock market's.
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                      os.pardir, os.pardir, "sandpile_models", "scripts",
+                      "core", "columnar.py")
+
+spec = importlib.util.spec_from_file_location(__name__, SOURCE)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+
+# Importing this script gives the sandpile models' module itself.
+sys.modules[__name__] = module
@@ -8,13 +8,27 @@ behaviour of a stock market index fund.
 from itertools import *
 import numpy as np
 import scipy as sp
-from scipy import stats
+from scipy import stats, special
 import matplotlib.pyplot as plt
 import pickle
+import queue
+import threading
+from functools import lru_cache
+from collections import namedtuple
+
+import columnar
 
 
 """ FUNCTIONS """
 
+Trades = namedtuple('Trades',
+                    [
+                    'time',
+                    'volume',
+                    'grid'
+                    ]
+                    )
+
 class StockMarket:
 
     """ THE STOCK MARKET SANDPILE MODEL:
@@ -46,12 +60,20 @@ class StockMarket:
 
     """
 
-    def __init__(self, length, width, threshold=4):
-        """Initialize a sandpile with the specified length and width."""
+    def __init__(self, length, width, threshold=4, cache_size=1024):
+        """Initialize a sandpile with the specified length and width.
+        The cumulative magnitude tables of up to `cache_size` numbers of
+        units are kept, evicting the least recently used.
+        """
         self.length = length
         self.width = width
         self.threshold = threshold
 
+        # Cached magnitude tables, by number of units. Call
+        # self.magnitude_table.cache_info() for the hits and misses.
+        self.magnitude_table = lru_cache(maxsize=cache_size)(
+                                    self.compute_magnitude_table)
+
         self.grid = np.zeros((length, width), dtype=int) + int(threshold / 2)
         self.demand = np.zeros((length, width), dtype=int)
 
@@ -59,6 +81,10 @@ class StockMarket:
         # The grid will store the volume at each time step.
         self.volume_history = []
 
+        # Whether to keep the volume history. Streams of indefinite length
+        # turn this off to run in constant memory.
+        self.record_history = True
+
         # Track the time of the course of the sandpile.
         self.time = 0
 
@@ -91,9 +117,13 @@ class StockMarket:
         of time added to the course of the sandpile.
         """
         self.time += 1
-        self.volume_history.append(self.volume())
+        volume = self.volume()
+        if self.record_history:
+            self.volume_history.append(volume)
         self.threshold += 0.001
 
+        return volume
+
     def volume(self):
         """Return the volume of the grid."""
 
@@ -108,29 +138,29 @@ class StockMarket:
         Parameters
         ==========
 
-        units: int
+        units: int or array
 
-            The number of units an investor (cell) holds.
+            The number of units an investor (cell) holds, or an array of the
+            number of units of many investors.
 
         """
 
         hold = 0.2
 
-        if units == 0:
-            sell, buy = 0, 1 - hold
-        else:
-            p = (1 - hold) * stats.norm.cdf(x=units,
-                                        loc=0.5*self.threshold,
-                                        scale=0.2*self.threshold
-                                        )
-            sell, buy = p, (1 - hold) - p
+        units = np.asarray(units)
+        p = (1 - hold) * special.ndtr((units - 0.5*self.threshold)
+                                      / (0.2*self.threshold))
+
+        sell = np.where(units == 0, 0, p)
+        buy = (1 - hold) - sell
 
         return sell, buy, hold
 
-    def magnitude_probability(self, units):
-        """ Determine the probability of an investor moving an amount of stock,
-        no matter how it is moved (sold or bought), which depends on the number
-        of units the investor currently holds.
+    def compute_magnitude_table(self, units):
+        """ Returns the cumulative probability of an investor moving each
+        amount of stock, which depends on the number of units the investor
+        currently holds (see `magnitude_probability`). Only the lowest 5% of
+        amounts can be moved. Use the cached `magnitude_table` instead.
 
         Parameters
         ==========
@@ -141,31 +171,76 @@ class StockMarket:
 
         """
 
+        # An investor without units can only move 0 units.
+        units = max(units, 1)
+
         p = 1 - stats.powerlaw.cdf(x=np.arange(units*0.05),
                                 a = 0.1,
                                 loc = 0,
                                 scale = units
                                 )
-        p = np.concatenate([p, 0.0 + np.zeros(int(units*0.95))])
         p /= sum(p)
 
-        return np.random.choice(units, p=p)
+        cdf = p.cumsum()
+        cdf /= cdf[-1]
+
+        return cdf
+
+    def magnitude_probability(self, units):
+        """ Determine the probability of an investor moving an amount of stock,
+        no matter how it is moved (sold or bought), which depends on the number
+        of units the investor currently holds, and draw an amount from it.
+        The amount is drawn by inverse-CDF sampling from the cached table of
+        the number of units.
+
+        Parameters
+        ==========
+
+        units: int
+
+            The number of units an investor (cell) holds.
+
+        """
+
+        return np.searchsorted(self.magnitude_table(int(units)),
+                               np.random.random_sample(), side="right")
 
     def update_demand_grid(self):
         """ Update the demand of each investor at a particular time. Each
         investor will either sell, buy or hold stock according to the
         probability distribution set by the number of units one holds. The
         number of units one buys or sells can also depend on the probability
-        distribution set by the number of units one holds
+        distribution set by the number of units one holds.
+        The demands of all investors are drawn at once by inverse-CDF
+        sampling, from two uniform numbers per investor, drawn in the same
+        order as drawing the amount and then the event of each investor in
+        turn with np.random.choice.
         """
 
-        for cell in product(range(self.length), range(self.width)):
-            i, j = cell
-            units = self.grid[i][j]
+        units = self.grid.ravel()
+        uniforms = np.random.random_sample((units.size, 2))
+
+        # Draw the amounts of the investors with the same number of units
+        # from their cached table, one group at a time.
+        values, inverse, counts = np.unique(units, return_inverse=True,
+                                            return_counts=True)
+        groups = np.split(np.argsort(inverse, kind="stable"),
+                          np.cumsum(counts)[:-1])
+
+        magnitude = np.empty(units.size, dtype=int)
+        for value, group in zip(values, groups):
+            magnitude[group] = np.searchsorted(self.magnitude_table(int(value)),
+                                               uniforms[group, 0],
+                                               side="right")
+
+        sell, buy, hold = self.demand_probability(units)
+        weights = np.stack([sell, buy, np.full(units.size, hold)], axis=1)
+        cdf = np.cumsum(weights, axis=1)
+        cdf /= cdf[:, -1:]
+        event = np.sum(cdf <= uniforms[:, 1:], axis=1)
 
-            events = self.magnitude_probability(int(units)) * np.array([-1, 1, 0])
-            weights = self.demand_probability(int(units))
-            self.demand[i][j] += np.random.choice(events, p=weights)
+        events = np.array([-1, 1, 0])[event] * magnitude
+        self.demand += events.reshape(self.grid.shape)
 
         return np.sum(self.demand)
 
@@ -173,6 +248,7 @@ class StockMarket:
         """ Execute one trade by updating the demand grid and then realising
         the demands of each investor into their volume of stocks.
         This function also resets the demand of investors back to zero.
+        Returns the volume of the grid after the trade.
         """
 
         self.update_demand_grid()
@@ -180,7 +256,7 @@ class StockMarket:
         self.grid += self.demand
         self.demand = np.zeros((self.length, self.width), dtype=int)
 
-        self.increment_time()
+        return self.increment_time()
 
     def run_simulation(self, duration):
         """ Run a number of trades set by the 'duration' parameter.
@@ -197,18 +273,131 @@ class StockMarket:
         for _ in range(duration):
             self.trade()
 
+    def simulate(self, duration=None, block_size=1, snapshots=False,
+                 record=True):
+        """ A generator that runs trades and yields them in blocks as they
+        are executed, as Trades of the times and volumes of the trades of the
+        block (arrays) and, optionally, a copy of the grid after the block.
+        The trades run only as the blocks are consumed.
+
+        Parameters
+        ==========
+
+        duration: int, optional
+
+            The number of trades to execute. If None, trades run until the
+            generator is closed. Defaults to None.
+
+        block_size: int, optional
+
+            The number of trades of each block. Defaults to 1.
+
+        snapshots: bool, optional
+
+            Yield a copy of the grid with each block. Defaults to False.
+
+        record: bool, optional
+
+            Keep the volume history of the trades. If False, the memory used
+            does not grow with the number of trades. Defaults to True.
+
+        """
+
+        record_history = self.record_history
+        self.record_history = record
+
+        try:
+            while duration is None or duration > 0:
+                size = block_size if duration is None else min(block_size,
+                                                               duration)
+
+                time = np.arange(self.time + 1, self.time + size + 1)
+                volume = np.array([self.trade() for _ in range(size)])
+                grid = self.grid.copy() if snapshots else None
+
+                if duration is not None:
+                    duration -= size
+
+                yield Trades(time, volume, grid)
+        finally:
+            self.record_history = record_history
+
+    def stream(self, duration=None, block_size=1000, snapshots=False,
+               record=False, queue_size=4):
+        """ Runs trades in a background thread and yields them in blocks, as
+        `simulate`, through a queue of at most `queue_size` blocks. The
+        trades run ahead of the analysis of the blocks, but never by more
+        than the queue. Closing the stream stops the trades.
+
+        Parameters
+        ==========
+
+        duration, block_size, snapshots, record:
+
+            As in `simulate`. Defaults to None, 1000, False and False.
+
+        queue_size: int, optional
+
+            The most number of blocks waiting to be consumed.
+            Defaults to 4.
+
+        """
+
+        blocks = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+
+        def put(item):
+            # Wait for room in the queue unless the stream is closed.
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            trades = self.simulate(duration, block_size, snapshots, record)
+            try:
+                for block in trades:
+                    if not put(block):
+                        break
+                put(None)
+            except Exception as error:
+                put(error)
+            finally:
+                trades.close()
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                block = blocks.get()
+                if block is None:
+                    break
+                if isinstance(block, Exception):
+                    raise block
+
+                yield block
+        finally:
+            stop.set()
+            thread.join()
+
     def save_simulation(self, fname):
         """ Creates a dictionary containing information of the run simulation,
         including the dimensions of the grid, the units of stock owned by
         each investor (from the grid) and a timeseries of the history of the
-        grid volume.
+        grid volume, and saves it to a directory in the columnar format (see
+        columnar.py), or as a pickle file if `fname` ends with ".pik".
+        Either can be loaded with `columnar.load_stats`.
 
         Parameters
         ==========
 
         fname: string
 
-            Name of output file.
+            Name of output directory, or of output pickle file.
 
         """
 
@@ -219,6 +408,9 @@ class StockMarket:
         simulation["Volume History"] = self.volume_history
         simulation["Grid"] = self.grid
 
-        pickle.dump(simulation, open(fname, "wb"))
+        if fname.endswith(".pik"):
+            pickle.dump(simulation, open(fname, "wb"))
+        else:
+            columnar.save_columns(fname, simulation)
 
         return simulation
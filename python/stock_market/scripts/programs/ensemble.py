@@ -0,0 +1,182 @@
+""" Ensemble of the stock market sandpile: Simulates many independent
+realizations (replicas) of the StockMarket in parallel across a pool of
+processes and estimates the distributions of the size and duration of
+crashes across all of them, rather than from a single path.
+
+The volume history of every replica is saved as one array, with a row for
+each replica, to a directory in the columnar format (see columnar.py),
+together with the crashes found in each replica.
+
+Run in terminal (from the scripts directory) as follows:
+python programs/ensemble.py [num_replicas] [seed] [processes]
+"""
+
+
+""" IMPORTS """
+import numpy as np
+import matplotlib.pyplot as plt
+import sys
+import os
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append("./core/")
+import sandpile
+import analysis
+import columnar
+
+
+""" INPUTS """
+length = 10
+width = 10
+threshold = 100
+duration = 5000
+
+crash_size = 1 # per cent.
+
+# Directory of the output of the ensemble.
+OUTPUT = "./../output/sandpile/ensemble/"
+
+
+""" FUNCTIONS """
+def run_replica(replica, seed=0):
+    """ Simulates one realization of the StockMarket and returns its volume
+    history as an array.
+
+    The global random number generator is seeded from a SeedSequence of the
+    seed and the replica, so replicas draw from independent streams.
+
+    Parameters
+    ==========
+
+    replica: int
+
+        Index of the realization.
+
+    seed: int, optional
+
+        Seed of the ensemble. Defaults to 0.
+
+    """
+
+    seed_sequence = np.random.SeedSequence([seed, replica])
+    random_state = np.random.RandomState(np.random.MT19937(seed_sequence))
+    np.random.set_state(random_state.get_state())
+
+    market = sandpile.StockMarket(length, width, threshold)
+    market.run_simulation(duration)
+
+    return np.array(market.volume_history)
+
+def run_ensemble(num_replicas, seed=0, processes=None):
+    """ Simulates the replicas in a pool of processes and returns their volume
+    histories as an array with a row for each replica.
+
+    Parameters
+    ==========
+
+    num_replicas: int
+
+        Number of realizations.
+
+    seed: int, optional
+
+        Seed of the ensemble. Defaults to 0.
+
+    processes: int, optional
+
+        Number of processes in the pool. If None, one per CPU.
+        Defaults to None.
+
+    """
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        volumes = list(pool.map(run_replica, range(num_replicas),
+                                [seed] * num_replicas))
+
+    return np.stack(volumes)
+
+def output_results(crashes, num_replicas, fname):
+    """ Saves the number of crashes and a summary of the distributions of
+    their size and duration to a text file.
+    """
+
+    with open(fname, 'w') as f:
+
+        f.write("SANDPILE ENSEMBLE OUTPUT\n" + "=" * 25 + "\n" * 2)
+
+        f.write(f"Replicas: {num_replicas}\n")
+        f.write(f"Trades per replica: {duration}\n")
+        f.write(f"Crashes (drop of at least {crash_size}%): "
+                f"{len(crashes.size)}\n")
+        f.write(f"Crashes per replica: {len(crashes.size) / num_replicas:.2f}"
+                "\n\n")
+
+        if not len(crashes.size):
+            return
+
+        for name, values, unit in [("Size", crashes.size, "%"),
+                                   ("Duration", crashes.duration, " days")]:
+            q1, median, q3 = np.percentile(values, [25, 50, 75])
+            f.write(f"{name}\n" + "-" * 15 + "\n")
+            f.write(f"Mean: {np.mean(values):.2f}{unit}\n")
+            f.write(f"Median: {median:.2f}{unit}\n")
+            f.write(f"Interquartile range: {q1:.2f}{unit} - {q3:.2f}{unit}\n")
+            f.write(f"Largest: {np.max(values):.2f}{unit}\n\n")
+
+def output_plot(crashes, fname):
+    """ Saves histograms of the size and duration of the crashes."""
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20,8))
+
+    ax1.hist(crashes.size, bins=30)
+    ax1.set_xlabel("Size (%)", fontsize=16)
+    ax1.set_ylabel("Number of crashes", fontsize=16)
+
+    ax2.hist(crashes.duration, bins=30)
+    ax2.set_xlabel("Duration (days)", fontsize=16)
+
+    fig.suptitle("Crashes of the Sandpile Ensemble", fontsize=28)
+
+    plt.savefig(fname)
+    plt.close()
+
+def main():
+
+    num_replicas = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    print("\n"+"="*30)
+    print("ENSEMBLE.PY: CRASHES OF MANY STOCK MARKET SANDPILES")
+    print("="*30+"\n")
+    print(f"Running {num_replicas} replicas of {duration} trades on "
+          f"{length} x {width} grids...\n")
+
+    start = perf_counter()
+    volumes = run_ensemble(num_replicas, seed, processes)
+    print(f"Done in {perf_counter() - start:.2f} s!\n")
+
+    crashes = analysis.crash_distribution(volumes, crash_size)
+
+    os.makedirs(OUTPUT, exist_ok=True)
+    fname = f"{OUTPUT}{length}_{width}_{duration}_{num_replicas}"
+    columnar.save_columns(fname, {
+        "Dimensions": (length, width),
+        "Threshold": threshold,
+        "Seed": seed,
+        "Volume History": volumes,
+        "Crash Replica": crashes.replica,
+        "Crash Duration": crashes.duration,
+        "Crash Size": crashes.size
+        })
+
+    output_results(crashes, num_replicas, f"{OUTPUT}crash_stats.txt")
+    output_plot(crashes, f"{OUTPUT}crash_distribution.png")
+
+    print(f"Found {len(crashes.size)} crashes. Output saved to {OUTPUT}")
+    print("="*30)
+
+""" EXECUTION """
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,6 @@
 
 """ IMPORTS """
 import numpy as np
-import pandas as pd
-import pickle
 
 import matplotlib.pyplot as plt
 
@@ -74,23 +72,26 @@ def output_plot(data):
 def main():
     market = sandpile.StockMarket(length, width, threshold)
 
-    market.run_simulation(duration)
-    fname = f"./../output/sandpile/{length}_{width}_{duration}.pik"
-    market.save_simulation(fname)
+    crash_size = 1 # per cent.
 
-    market_data = pickle.load(open(fname, "rb"))
+    # Collect the volume from the market as the trades are executed, and
+    # detect crashes online as they happen.
+    detector = analysis.DrawdownDetector(crash_size)
+    blocks = []
+    for trades in market.stream(duration, block_size=500, record=True):
+        blocks.append(trades.volume)
+        detector.extend(trades.volume, trades.time)
+    volume_history = np.concatenate(blocks)
 
-    volume_history = market_data["Volume History"]
+    print(f"Crashes detected online: {len(detector.crash_history)}")
 
-    start_time = "2020-01-01"
-    end_time = np.datetime64(start_time) + np.timedelta64(len(volume_history))
-    time_range = np.arange(start_time, end_time, dtype='datetime64[D]')
+    fname = f"./../output/sandpile/{length}_{width}_{duration}"
+    market.save_simulation(fname)
 
-    x = pd.Series(np.array(volume_history), index=time_range)
+    x = analysis.timeseries(volume_history, start_time="2020-01-01")
 
     data = analysis.CrashAnalysis(x)
 
-    crash_size = 1 # per cent.
     data.crash_detection(crash_size)
 
     crashes = [